@@ -1,10 +1,10 @@
+import importlib.metadata
 import logging
 import pathlib
 
-import pkg_resources
 from mopidy import config, ext
 
-__version__ = pkg_resources.get_distribution("Mopidy-Tubeify").version
+__version__ = importlib.metadata.version("Mopidy-Tubeify")
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +32,43 @@ class Extension(ext.Extension):
         schema["spotify_playlists"] = config.List()
         schema["tidal_playlists"] = config.List()
 
+        schema["match_cache"] = config.Boolean()
+        schema["match_cache_ttl"] = config.Integer(minimum=0)
+        schema["match_cache_max_entries"] = config.Integer(minimum=0)
+        schema["match_cache_negative_ttl"] = config.Integer(minimum=0)
+        schema["match_cache_negative_max_ttl"] = config.Integer(minimum=0)
+        schema["isrc_index_file"] = config.Path(optional=True)
+
+        schema["ytm_max_workers"] = config.Integer(minimum=1)
+        schema["ytm_initial_concurrency"] = config.Integer(minimum=1)
+        schema["ytm_rate_limit"] = config.Float(minimum=0)
+        schema["ytm_burst"] = config.Integer(minimum=1)
+        schema["ytm_target_latency"] = config.Float(minimum=0)
+
+        schema["browse_partial_tracks"] = config.Integer(minimum=0)
+        schema["browse_partial_timeout"] = config.Float(minimum=0)
+        schema["service_timeout"] = config.Float(minimum=0)
+        schema["warm_up_services"] = config.Boolean()
+        schema["service_connect_timeout"] = config.Float(minimum=0)
+        schema["service_read_timeout"] = config.Float(minimum=0)
+        schema["service_deadlines"] = config.List(optional=True)
+        schema["circuit_failures"] = config.Integer(minimum=0)
+        schema["circuit_cool_down"] = config.Float(minimum=0)
+        schema["html_parser"] = config.String(
+            choices=["html.parser", "lxml", "html5lib"]
+        )
+        schema["http_cache"] = config.Boolean()
+        schema["http_cache_max_bytes"] = config.Integer(minimum=0)
+        schema["http_cache_min_fresh"] = config.List(optional=True)
+        schema["browse_cache_ttl"] = config.Integer(minimum=0)
+        schema["browse_cache_ttls"] = config.List(optional=True)
+        schema["browse_cache_empty_ttl"] = config.Integer(minimum=0)
+        schema["browse_cache_max_stale"] = config.Integer(minimum=0)
+        schema["browse_cache_max_bytes"] = config.Integer(minimum=0)
+        schema["matcher_cache_max_bytes"] = config.Integer(minimum=0)
+        schema["browse_store"] = config.Boolean()
+        schema["browse_store_max_bytes"] = config.Integer(minimum=0)
+
         return schema
 
     def setup(self, registry):
@@ -43,6 +80,9 @@ class Extension(ext.Extension):
         )
 
     def factory(self, config, core):
-        from .web import WebHandler
+        from .web import MetricsHandler, WebHandler
 
-        return [(r"/", WebHandler, {"config": config, "core": core})]
+        return [
+            (r"/", WebHandler, {"config": config, "core": core}),
+            (r"/metrics", MetricsHandler, {"config": config, "core": core}),
+        ]
@@ -0,0 +1,37 @@
+class AccessTimes:
+    """
+    When the rows of one of the SQLite stores were last used, which
+    decides the least recently used to evict. A hit is only remembered,
+    and the times are written together once `batch` rows are waiting,
+    rather than in a transaction per hit; the store flushes them before
+    it evicts, and when it is closed. The store's lock is held around
+    every call.
+    """
+
+    batch = 100
+
+    def __init__(self, table, key):
+        self._update = f"UPDATE {table} SET accessed = ? WHERE {key} = ?"
+        # key -> when it was last used, not yet written
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def touch(self, db, key, now):
+        self._pending[key] = now
+        if len(self._pending) >= self.batch:
+            with db:
+                self.flush(db)
+
+    def flush(self, db):
+        # callers are inside a transaction
+        if self._pending:
+            db.executemany(
+                self._update,
+                [(now, key) for key, now in self._pending.items()],
+            )
+            self._pending.clear()
+
+    def clear(self):
+        self._pending.clear()
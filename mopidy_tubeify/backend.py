@@ -1,34 +1,19 @@
-import json
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import pykka
-from cachetools import TTLCache, cached
 from mopidy import backend, httpclient
 from mopidy.models import Image, Ref, Track, Artist, Album
-from ytmusicapi import YTMusic
 
-from mopidy_tubeify import Extension, logger
-from mopidy_tubeify.allmusic import AllMusic
-from mopidy_tubeify.amrap import Amrap
-from mopidy_tubeify.apple import Apple
-# from mopidy_tubeify.bestlivealbums import BestLiveAlbums
+from mopidy_tubeify import Extension, logger, metrics, timing, yt_matcher
+from mopidy_tubeify.browsecache import BrowseCache, BrowseStore
 from mopidy_tubeify.data import extract_playlist_id, extract_user_id
-from mopidy_tubeify.discogs import Discogs
-from mopidy_tubeify.farout import FarOut
-from mopidy_tubeify.fmspins import FMSpins
-from mopidy_tubeify.kcrw import KCRW
-# from mopidy_tubeify.kexp import KEXP
-# from mopidy_tubeify.lastfm import LastFM
-from mopidy_tubeify.musicreviewworld import MusicReviewWorld
-from mopidy_tubeify.nme import NME
-from mopidy_tubeify.npr import NPR
-from mopidy_tubeify.paste import Paste
-from mopidy_tubeify.pitchfork import Pitchfork
-from mopidy_tubeify.rollingstone import RollingStone
-from mopidy_tubeify.spotify import Spotify
-from mopidy_tubeify.tidal import Tidal
-from mopidy_tubeify.tripler import TripleR
-from mopidy_tubeify.whathifi import WhatHiFi
+from mopidy_tubeify.httpcache import HTTPCache
+from mopidy_tubeify.matchcache import MatchCache
+from mopidy_tubeify.preload import preload_uri
+from mopidy_tubeify.registry import ServiceRegistry
+from mopidy_tubeify.scheduler import MatcherScheduler
 
 
 class TubeifyBackend(pykka.ThreadingActor, backend.Backend):
@@ -44,6 +29,29 @@ class TubeifyBackend(pykka.ThreadingActor, backend.Backend):
         self.spotify_users = config["tubeify"]["spotify_users"]
         self.spotify_playlists = config["tubeify"]["spotify_playlists"]
         self.tidal_playlists = config["tubeify"]["tidal_playlists"]
+        self.browse_partial_tracks = config["tubeify"]["browse_partial_tracks"]
+        self.browse_partial_timeout = config["tubeify"][
+            "browse_partial_timeout"
+        ]
+        self.service_timeout = config["tubeify"]["service_timeout"]
+
+        browse_cache = self.library.tubeify_cache
+        browse_cache.ttl = config["tubeify"]["browse_cache_ttl"]
+        browse_cache.empty_ttl = config["tubeify"]["browse_cache_empty_ttl"]
+        browse_cache.max_stale = config["tubeify"]["browse_cache_max_stale"]
+        browse_cache.max_bytes = config["tubeify"]["browse_cache_max_bytes"]
+        yt_matcher.yt_matcher_cache.max_bytes = config["tubeify"][
+            "matcher_cache_max_bytes"
+        ]
+        browse_cache.ttls = {}
+        for ttl in config["tubeify"]["browse_cache_ttls"]:
+            try:
+                kind, seconds = ttl.rsplit(":", 1)
+                browse_cache.ttls[kind] = int(seconds)
+            except ValueError:
+                logger.error(
+                    f"browse_cache_ttls: {ttl} is not [service:]kind:seconds"
+                )
         self.uri_schemes = ["tubeify"]
         self.user_agent = "{}/{}".format(Extension.dist_name, Extension.version)
 
@@ -59,56 +67,138 @@ class TubeifyBackend(pykka.ThreadingActor, backend.Backend):
             )
         }
 
+        # imported here, not when mopidy loads the extension
+        from ytmusicapi import YTMusic
+
+        from mopidy_tubeify.serviceclient import ServiceClient
+
         self.ytmusic = YTMusic()
 
-        standard_services = [
-            AllMusic,
-            Apple,
-            # BestLiveAlbums,
-            Discogs,
-            FarOut,
-            # FMSpins,  # authenticated, now
-            KCRW,
-            # KEXP,
-            MusicReviewWorld,
-            NME,
-            NPR,
-            Paste,
-            Pitchfork,
-            RollingStone,
-            Spotify,
-            TripleR,
-            WhatHiFi,
+        yt_matcher.scheduler.shutdown()
+        yt_matcher.scheduler = MatcherScheduler(
+            max_workers=self.config["tubeify"]["ytm_max_workers"],
+            initial_concurrency=self.config["tubeify"][
+                "ytm_initial_concurrency"
+            ],
+            rate=self.config["tubeify"]["ytm_rate_limit"],
+            burst=self.config["tubeify"]["ytm_burst"],
+            target_latency=self.config["tubeify"]["ytm_target_latency"],
+        )
+
+        if self.config["tubeify"]["browse_store"]:
+            self.library.tubeify_cache.store = BrowseStore(
+                Extension.get_cache_dir(self.config) / "browse.sqlite3",
+                max_bytes=self.config["tubeify"]["browse_store_max_bytes"],
+            )
+
+        if self.config["tubeify"]["match_cache"]:
+            yt_matcher.match_store = MatchCache(
+                Extension.get_cache_dir(self.config) / "matches.sqlite3",
+                ttl=self.config["tubeify"]["match_cache_ttl"],
+                max_entries=self.config["tubeify"]["match_cache_max_entries"],
+                negative_ttl=self.config["tubeify"]["match_cache_negative_ttl"],
+                negative_max_ttl=self.config["tubeify"][
+                    "match_cache_negative_max_ttl"
+                ],
+            )
+            metrics.caches["match_store"] = yt_matcher.match_store
+            isrc_index_file = self.config["tubeify"]["isrc_index_file"]
+            if isrc_index_file and isrc_index_file.exists():
+                try:
+                    yt_matcher.match_store.import_isrcs(isrc_index_file)
+                except Exception as e:
+                    logger.error(f"error importing {isrc_index_file}: {e}")
+
+        ServiceClient.service_deadline = (
+            self.config["tubeify"]["service_connect_timeout"],
+            self.config["tubeify"]["service_read_timeout"],
+        )
+        ServiceClient.service_deadlines = {}
+        for deadline in self.config["tubeify"]["service_deadlines"]:
+            try:
+                service, connect, read = deadline.split(":")
+                ServiceClient.service_deadlines[service] = (
+                    float(connect),
+                    float(read),
+                )
+            except ValueError:
+                logger.error(
+                    f"service_deadlines: {deadline} is not service:connect:read"
+                )
+        ServiceClient.circuit_failures = self.config["tubeify"][
+            "circuit_failures"
+        ]
+        ServiceClient.circuit_cool_down = self.config["tubeify"][
+            "circuit_cool_down"
         ]
+        ServiceClient.html_parser = self.config["tubeify"]["html_parser"]
+        ServiceClient.cache_dir = Extension.get_cache_dir(self.config)
 
-        self.services = {
-            service.service_uri: service(proxy, headers, self.ytmusic)
-            for service in standard_services
+        if self.config["tubeify"]["http_cache"]:
+            ServiceClient.http_cache = HTTPCache(
+                Extension.get_cache_dir(self.config) / "pages.sqlite3",
+                max_bytes=self.config["tubeify"]["http_cache_max_bytes"],
+            )
+            metrics.caches["http"] = ServiceClient.http_cache
+        ServiceClient.http_cache_min_fresh = {}
+        for min_fresh in self.config["tubeify"]["http_cache_min_fresh"]:
+            try:
+                service, seconds = min_fresh.split(":")
+                ServiceClient.http_cache_min_fresh[service] = float(seconds)
+            except ValueError:
+                logger.error(
+                    f"http_cache_min_fresh: {min_fresh} is not service:seconds"
+                )
+
+        # the services' clients, by service_uri; each is imported when the
+        # service is first used (see ServiceRegistry)
+        standard_services = {
+            "allmusic": "mopidy_tubeify.allmusic:AllMusic",
+            "applemusic": "mopidy_tubeify.apple:Apple",
+            # "bestlivealbums": "mopidy_tubeify.bestlivealbums:BestLiveAlbums",
+            "discogs": "mopidy_tubeify.discogs:Discogs",
+            "farout": "mopidy_tubeify.farout:FarOut",
+            # "fmspins": "mopidy_tubeify.fmspins:FMSpins",  # authenticated, now
+            "kcrw": "mopidy_tubeify.kcrw:KCRW",
+            # "kexp": "mopidy_tubeify.kexp:KEXP",
+            "musicreviewworld": "mopidy_tubeify.musicreviewworld:MusicReviewWorld",
+            "nme": "mopidy_tubeify.nme:NME",
+            "npr": "mopidy_tubeify.npr:NPR",
+            "paste": "mopidy_tubeify.paste:Paste",
+            "pitchfork": "mopidy_tubeify.pitchfork:Pitchfork",
+            "rollingstone": "mopidy_tubeify.rollingstone:RollingStone",
+            "spotify": "mopidy_tubeify.spotify:Spotify",
+            "tripler": "mopidy_tubeify.tripler:TripleR",
+            "whathifi": "mopidy_tubeify.whathifi:WhatHiFi",
         }
 
-        authenticated_services = [FMSpins]  # [LastFM]
+        # services are made when first used, too
+        self.services = ServiceRegistry()
+        for service_uri, service in standard_services.items():
+            self.services.register(
+                service_uri, service, proxy, headers, self.ytmusic
+            )
+
+        authenticated_services = {
+            "fmspins": "mopidy_tubeify.fmspins:FMSpins",
+            # "lastfm": "mopidy_tubeify.lastfm:LastFM",
+        }
 
-        [
-            self.services.update(
-                {
-                    service.service_uri: service(
-                        proxy,
-                        headers,
-                        self.ytmusic,
-                        self.config["tubeify"][
-                            f"{service.service_uri}_username"
-                        ],
-                        self.config["tubeify"][
-                            f"{service.service_uri}_password"
-                        ],
-                    )
-                }
+        for service_uri, service in authenticated_services.items():
+            self.services.register(
+                service_uri,
+                service,
+                proxy,
+                headers,
+                self.ytmusic,
+                self.config["tubeify"][f"{service_uri}_username"],
+                self.config["tubeify"][f"{service_uri}_password"],
             )
-            for service in authenticated_services
-        ]
 
         if self.tidal_playlists:
-            self.services[Tidal.service_uri] = Tidal(
+            self.services.register(
+                "tidal",
+                "mopidy_tubeify.tidal:Tidal",
                 proxy,
                 {
                     "User-Agent": (
@@ -123,15 +213,106 @@ class TubeifyBackend(pykka.ThreadingActor, backend.Backend):
 
         # Amrap() is a generic client for AMRAP Radio Stations
         # see https://radiopages.info/ for a list of them
-        self.services["3pbs"] = Amrap(
+        station_logo = (
+            "https://www.pbsfm.org.au/sites/default/files/"
+            "pbs-logo-stacked-col-2014.gif"
+        )
+        self.services.register(
+            "3pbs",
+            "mopidy_tubeify.amrap:Amrap",
             proxy,
             headers,
             self.ytmusic,
             stationId="3pbs",
             stationName="3PBS 106.7FM",
-            stationLogo="https://www.pbsfm.org.au/sites/default/files/pbs-logo-stacked-col-2014.gif",
+            stationLogo=station_logo,
+            name="3PBS 106.7FM",
+            image=station_logo,
         )
 
+        if self.config["tubeify"]["warm_up_services"]:
+            self.services.warm_up()
+
+    def on_stop(self):
+        yt_matcher.scheduler.shutdown()
+        self.library.service_executor.shutdown(wait=False)
+
+        browse_store = self.library.tubeify_cache.store
+        if browse_store is not None:
+            self.library.tubeify_cache.store = None
+            browse_store.close()
+
+        if yt_matcher.match_store is not None:
+            isrc_index_file = self.config["tubeify"]["isrc_index_file"]
+            if isrc_index_file:
+                try:
+                    yt_matcher.match_store.export_isrcs(isrc_index_file)
+                except Exception as e:
+                    logger.error(f"error exporting {isrc_index_file}: {e}")
+            metrics.caches.pop("match_store", None)
+            yt_matcher.match_store.close()
+            yt_matcher.match_store = None
+
+        from mopidy_tubeify.serviceclient import ServiceClient
+
+        http_cache = ServiceClient.http_cache
+        if http_cache is not None:
+            # no more requests use it once it is closed
+            ServiceClient.http_cache = None
+            metrics.caches.pop("http", None)
+            http_cache.close()
+
+
+class MatchProgress:
+    """
+    Collects the tracks of a playlist browse as they are matched, for
+    yt_matcher.report_progress.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._batches = []
+        self.matched_count = 0
+        self.done = False
+        self.refs = []
+
+    def start(self, total):
+        with self._condition:
+            self._batches.append([None] * total)
+            return len(self._batches) - 1
+
+    def matched(self, batch, index, track):
+        with self._condition:
+            self._batches[batch][index] = track
+            if track.get("videoId"):
+                self.matched_count += 1
+                self._condition.notify_all()
+
+    def finish(self, refs):
+        with self._condition:
+            self.refs = refs
+            self.done = True
+            self._condition.notify_all()
+
+    def wait(self, count, timeout):
+        # returns the tracks matched so far, in playlist order, once count
+        # of them have been matched, browsing is done, or timeout is up;
+        # but never an empty list before browsing is done (eg, for lists
+        # of albums, which are not matched track by track)
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.done or self.matched_count >= count, timeout
+            )
+            self._condition.wait_for(
+                lambda: self.done or self.matched_count > 0
+            )
+            return [
+                track
+                for batch in self._batches
+                for track in batch
+                if track is not None
+            ]
+
 
 class TubeifyLibraryProvider(backend.LibraryProvider):
     """
@@ -143,16 +324,134 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
 
     root_directory = Ref.directory(uri="tubeify:browse", name="Tubeify")
 
-    cache_max_len = 4000
+    cache_max_bytes = 33554432
     cache_ttl = 21600
 
-    tubeify_cache = TTLCache(maxsize=cache_max_len, ttl=cache_ttl)
+    tubeify_cache = BrowseCache(max_bytes=cache_max_bytes, ttl=cache_ttl)
+
+    def __init__(self, backend):
+        super().__init__(backend)
+        self._pending_lock = threading.Lock()
+        self._pending = {}
+        self._refreshing = set()
+        metrics.caches["browse"] = self.tubeify_cache
+        self.service_executor = ThreadPoolExecutor(
+            thread_name_prefix="TubeifyService"
+        )
 
-    @cached(cache=tubeify_cache)
     def browse(self, uri):
+        cached = self.tubeify_cache.lookup(uri)
+        if cached is not None:
+            refs, fresh = cached
+            if not fresh:
+                self._refresh_in_background(uri)
+            return refs
+
+        if self.backend.browse_partial_tracks and extract_playlist_id(uri):
+            return self._browse_partial(uri)
+
+        with timing.trace(f"browse {uri}") as trace, timing.stage("browse"):
+            refs = self._browse(uri)
+        metrics.record_browse(trace)
+        # don't keep listings with placeholders for services that timed out
+        if not trace.counters.get("service_timeouts"):
+            self.tubeify_cache[uri] = refs
+        return refs
+
+    def _browse_partial(self, uri):
+        # match the playlist in the background, returning what has been
+        # matched so far once there are enough tracks (or it is taking too
+        # long); when the background browse completes, the full result is
+        # cached for the next browse
+        with self._pending_lock:
+            progress = self._pending.get(uri)
+            if progress is None:
+                progress = self._pending[uri] = MatchProgress()
+                threading.Thread(
+                    target=self._browse_in_background,
+                    args=(uri, progress),
+                    name=f"TubeifyBrowse-{uri}",
+                    daemon=True,
+                ).start()
+
+        tracks = progress.wait(
+            self.backend.browse_partial_tracks,
+            self.backend.browse_partial_timeout,
+        )
+        if progress.done:
+            return progress.refs
+
+        logger.debug(f"browse {uri}: partial result, {len(tracks)} tracks")
+        return self.extract_trackrefs(tracks)
+
+    def _browse_in_background(self, uri, progress):
+        refs = []
+        try:
+            with timing.trace(f"browse {uri}") as trace:
+                with timing.stage("browse"), yt_matcher.report_progress(
+                    progress
+                ):
+                    refs = self._browse(uri)
+            metrics.record_browse(trace)
+            self.tubeify_cache[uri] = refs
+        except Exception as e:
+            logger.error(f"error browsing {uri}: {e}")
+        finally:
+            with self._pending_lock:
+                del self._pending[uri]
+            progress.finish(refs)
+
+    def _refresh_in_background(self, uri):
+        with self._pending_lock:
+            if uri in self._refreshing:
+                return
+            self._refreshing.add(uri)
+        threading.Thread(
+            target=self._refresh,
+            args=(uri,),
+            name=f"TubeifyRefresh-{uri}",
+            daemon=True,
+        ).start()
+
+    def _refresh(self, uri):
+        try:
+            with timing.trace(f"refresh {uri}") as trace:
+                with timing.stage("browse"):
+                    refs = self._browse(uri)
+            metrics.record_browse(trace)
+            # a refresh that fails, or times out, leaves the stale refs
+            if refs and not trace.counters.get("service_timeouts"):
+                self.tubeify_cache[uri] = refs
+        except Exception as e:
+            logger.error(f"error refreshing {uri}: {e}")
+        finally:
+            with self._pending_lock:
+                self._refreshing.discard(uri)
+
+    def _cache_late_refs(self, uri, future):
+        if not future.exception():
+            self.tubeify_cache[uri] = future.result()
+
+    def _browse(self, uri):
+        def service_refs(kind, selected_service, listoflists):
+            items = getattr(
+                self.backend.services[selected_service],
+                f"get_{kind}_details",
+            )(listoflists)
+            return [
+                Ref.directory(
+                    uri=(
+                        f"tubeify:"
+                        f"{selected_service}:"
+                        f"{kind[:-1]}_"
+                        f"{item['id']}"
+                    ),
+                    name=item["name"],
+                )
+                for item in items or []
+            ]
+
         def get_refs(kind, selected_services, listoflists=None):
-            refs = []
-            items = []
             # need to fix this
             if len(selected_services) > 1 and listoflists:
                 logger.error(
@@ -160,41 +459,68 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
                     f"not {selected_services}"
                 )
 
+            # listoflists is for the first service, the others use the
+            # lists in the config
+            services_lists = {}
             for selected_service in selected_services:
-                get_details_method = getattr(
-                    self.backend.services[selected_service],
-                    f"get_{kind}_details",
-                    None,
+                services_lists[selected_service] = listoflists or getattr(
+                    self.backend,
+                    f"{selected_service}_{kind}",
+                    [],
                 )
-
-                if not listoflists:
-                    listoflists = getattr(
-                        self.backend,
-                        f"{selected_service}_{kind}",
-                        [],
-                    )
-
-                if listoflists:
-                    items = get_details_method(listoflists)
-
-                # need to fix this, too; listoflists reset to None
-                # for each service in the list of selected services
                 listoflists = None
-                if items:
-                    refs.extend(
-                        [
-                            Ref.directory(
-                                uri=(
-                                    f"tubeify:"
-                                    f"{selected_service}:"
-                                    f"{kind[:-1]}_"
-                                    f"{item['id']}"
-                                ),
-                                name=item["name"],
-                            )
-                            for item in items
-                        ]
+            services_lists = {
+                selected_service: service_lists
+                for selected_service, service_lists in services_lists.items()
+                if service_lists
+            }
+
+            if len(services_lists) == 1:
+                ((selected_service, service_lists),) = services_lists.items()
+                return service_refs(kind, selected_service, service_lists)
+
+            # ask all the services at once, and list those that finish
+            # in time; the others get a placeholder, browsing which asks
+            # the service again (or finds its late result in the cache)
+            trace = timing.current()
+
+            def traced_service_refs(selected_service, service_lists):
+                with timing.activate(trace):
+                    return service_refs(kind, selected_service, service_lists)
+
+            futures = {
+                selected_service: self.service_executor.submit(
+                    traced_service_refs, selected_service, service_lists
+                )
+                for selected_service, service_lists in services_lists.items()
+            }
+            timeout = self.backend.service_timeout or None
+            done, _ = wait(futures.values(), timeout=timeout)
+
+            refs = []
+            for selected_service, future in futures.items():
+                uri = f"tubeify:{selected_service}:{kind}"
+                if future in done:
+                    try:
+                        refs.extend(future.result())
+                    except Exception as e:
+                        logger.error(f"error browsing {uri}: {e}")
+                    continue
+
+                logger.warn(f"{uri} timed out after {timeout}s")
+                timing.count("service_timeouts")
+                refs.append(
+                    Ref.directory(
+                        uri=uri,
+                        name=(
+                            f"{self.backend.services.name(selected_service)}"
+                            f" {kind} (timed out)"
+                        ),
                     )
+                )
+                future.add_done_callback(
+                    lambda future, uri=uri: self._cache_late_refs(uri, future)
+                )
             return refs
 
         # if we're browsing, return a list of directories
@@ -210,10 +536,10 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
 
             servicerefs = [
                 Ref.directory(
-                    uri=f"tubeify:{service.service_uri}:root",
-                    name=service.service_name,
+                    uri=f"tubeify:{service}:root",
+                    name=self.backend.services.name(service),
                 )
-                for service in self.backend.services.values()
+                for service in self.backend.services
             ]
 
             directoryrefs.extend(
@@ -235,7 +561,7 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
                 directoryrefs.append(
                     Ref.directory(
                         uri=f"tubeify:{selected_service}:home",
-                        name=f"{self.backend.services[selected_service].service_name} Homepage",
+                        name=f"{self.backend.services.name(selected_service)} Homepage",
                     )
                 )
 
@@ -248,7 +574,10 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
                         directoryrefs.append(
                             Ref.directory(
                                 uri=f"tubeify:{selected_service}:{list_type}",
-                                name=f"{self.backend.services[selected_service].service_name} {list_type}",
+                                name=(
+                                    f"{self.backend.services.name(selected_service)}"
+                                    f" {list_type}"
+                                ),
                             )
                         )
             return directoryrefs
@@ -370,6 +699,7 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
             ]
         return good_tracks, good_albums
 
+    @timing.timed("refs")
     def extract_trackrefs(self, tracks):
         trackrefs = []
 
@@ -389,17 +719,15 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
             # include ytmusic data for all tracks as preload data in the uri
             # for the first track.  There is surely a better way to do this.
             # It breaks the first track in the musicbox_webclient
-            first_track = [
-                track
-                for track in good_tracks
-                if f"yt:video:{track['videoId']}" == trackrefs[0].uri
-            ][0]
-
+            first_track = good_tracks[0]
             trackrefs[0] = Ref.track(
-                uri=(
-                    f"yt:video:{first_track['videoId']}"
-                    f":preload:"
-                    f"{(json.dumps([track for track in good_tracks if track is not None and len(track)>3])).encode('utf-8').hex()}"
+                uri=preload_uri(
+                    first_track["videoId"],
+                    [
+                        track
+                        for track in good_tracks
+                        if track is not None and len(track) > 3
+                    ],
                 ),
                 name=first_track["title"],
             )
@@ -434,19 +762,17 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
             else:
                 identifier = None
             if service in self.backend.services:
-                if identifier and self.backend.services[service].uri_images.get(
+                # a service that hasn't been started has no playlist images
+                started = self.backend.services.started(service)
+                if (
                     identifier
+                    and started
+                    and started.uri_images.get(identifier)
                 ):
+                    images[uri] = (Image(uri=started.uri_images[identifier]),)
+                elif self.backend.services.image(service):
                     images[uri] = (
-                        Image(
-                            uri=self.backend.services[service].uri_images[
-                                identifier
-                            ]
-                        ),
-                    )
-                elif self.backend.services[service].service_image:
-                    images[uri] = (
-                        Image(uri=self.backend.services[service].service_image),
+                        Image(uri=self.backend.services.image(service)),
                     )
         return images
 
@@ -489,9 +815,18 @@ class TubeifyLibraryProvider(backend.LibraryProvider):
                             )
                             for artist in track.get("artists", {})
                         ],
-                        album=Album(
-                            name=track.get("album", {}).get("name"),
-                            uri=f"yt:playlist:{track.get('album', {}).get('id')}",
+                        # a match's album is None if it has none
+                        album=(
+                            Album(
+                                name=track["album"].get("name"),
+                                uri=(
+                                    f"yt:playlist:{track['album']['id']}"
+                                    if track["album"].get("id")
+                                    else None
+                                ),
+                            )
+                            if track.get("album")
+                            else None
                         ),
                         length=track.get("duration_seconds", 0),
                         comment=track["videoId"],
@@ -0,0 +1,310 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from mopidy.models import Ref
+
+from mopidy_tubeify import logger
+from mopidy_tubeify.accesstimes import AccessTimes
+from mopidy_tubeify.sizedcache import getsizeof
+
+uri_regex = re.compile(r"^tubeify:(?P<service>[^:]+):(?P<kind>.+)$")
+
+
+def uri_kind(uri):
+    """
+    The service and kind of a browsed uri: browse, root, home, users,
+    playlists, user, playlist or listoflists.
+    """
+    match = uri_regex.match(uri)
+    if not match:
+        return None, "browse"
+    kind = match["kind"]
+    if kind.startswith("user_"):
+        return match["service"], "user"
+    if kind.startswith("playlist_listoflists-"):
+        return match["service"], "listoflists"
+    if kind.startswith("playlist_"):
+        return match["service"], "playlist"
+    return match["service"], kind
+
+
+class BrowseStore:
+    """
+    The browse cache's entries on disk, in an SQLite database (normally
+    in the Mopidy cache dir), so that they survive restarts. The database
+    is opened when it is first used, and entries are read as they are
+    looked up. A store written with another `version` of the format is
+    emptied. Once the entries take more than `max_bytes`, the least
+    recently used are evicted.
+    """
+
+    version = 2
+
+    evict_every = 20
+
+    def __init__(self, path, max_bytes=20971520):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.access_times = AccessTimes("refs", "uri")
+        self._db = None
+
+    def _open(self):
+        # callers hold self._lock
+        if self._db is not None:
+            return self._db
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.version:
+                logger.debug(f"browse store {self.path}: new version")
+                self._db.execute("DROP TABLE IF EXISTS refs")
+                self._db.execute(f"PRAGMA user_version = {self.version:d}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS refs ("
+                "uri TEXT PRIMARY KEY, "
+                "refs BLOB NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created REAL NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS refs_accessed ON refs (accessed)"
+            )
+            self._evict()
+        return self._db
+
+    def __len__(self):
+        with self._lock:
+            return (
+                self._open().execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+            )
+
+    def size(self):
+        with self._lock:
+            return (
+                self._open()
+                .execute("SELECT COALESCE(SUM(size), 0) FROM refs")
+                .fetchone()[0]
+            )
+
+    def get(self, uri):
+        """The refs stored for uri and when they were browsed, or None."""
+        with self._lock:
+            row = (
+                self._open()
+                .execute("SELECT refs, created FROM refs WHERE uri = ?", (uri,))
+                .fetchone()
+            )
+            if row is None:
+                return None
+            self.access_times.touch(self._db, uri, time.time())
+        data, created = row
+        refs = [
+            Ref(type=ref_type, uri=ref_uri, name=name)
+            for ref_type, ref_uri, name in json.loads(zlib.decompress(data))
+        ]
+        return refs, created
+
+    def set(self, uri, refs, created):
+        data = zlib.compress(
+            json.dumps(
+                [[ref.type, ref.uri, ref.name] for ref in refs],
+                separators=(",", ":"),
+            ).encode("utf-8")
+        )
+        size = len(data) + len(uri)
+        with self._lock:
+            db = self._open()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO refs VALUES (?, ?, ?, ?, ?)",
+                    (uri, data, size, created, time.time()),
+                )
+                self._writes += 1
+                if self._writes % self.evict_every == 0:
+                    self._evict()
+
+    def delete(self, uri):
+        with self._lock:
+            db = self._open()
+            with db:
+                db.execute("DELETE FROM refs WHERE uri = ?", (uri,))
+
+    def clear(self):
+        with self._lock:
+            db = self._open()
+            with db:
+                db.execute("DELETE FROM refs")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                with self._db:
+                    self.access_times.flush(self._db)
+                self._db.close()
+                self._db = None
+
+    def _evict(self):
+        # callers hold self._lock inside a transaction; keeps the most
+        # recently used entries that fit in max_bytes
+        self.access_times.flush(self._db)
+        if not self.max_bytes:
+            return
+        evicted = self._db.execute(
+            "DELETE FROM refs WHERE uri IN ("
+            "SELECT uri FROM ("
+            "SELECT uri, SUM(size) OVER ("
+            "ORDER BY accessed DESC ROWS UNBOUNDED PRECEDING) AS total "
+            "FROM refs) WHERE total > ?)",
+            (self.max_bytes,),
+        ).rowcount
+        if evicted > 0:
+            logger.debug(f"browse store evicted {evicted} entries")
+
+
+class BrowseCache:
+    """
+    The refs of browsed uris. An entry is fresh for the ttl of its kind
+    of uri (ttls, by "service:kind" or "kind", else ttl), and then stale
+    for up to max_stale seconds, when browse serves it while refreshing
+    it in the background. Empty listings, as often as not from a failed
+    scrape, are only kept for empty_ttl seconds. Once the entries take
+    more than max_bytes of memory (0 for no limit), as measured by
+    getsizeof, or there are more than maxsize of them (None for no
+    limit), the least recently used are evicted. With a `store` (a
+    BrowseStore), the listings fetched from the services (stored_kinds)
+    are also kept on disk, and looked up there when they are not in
+    memory; the rest are built from the config, which can change between
+    restarts.
+    """
+
+    stored_kinds = ("home", "user", "playlist", "listoflists")
+
+    def __init__(
+        self,
+        maxsize=None,
+        ttl=21600,
+        ttls=None,
+        empty_ttl=300,
+        max_stale=0,
+        store=None,
+        max_bytes=0,
+    ):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.empty_ttl = empty_ttl
+        self.max_stale = max_stale
+        self.store = store
+        self.currsize = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # uri -> (refs, when they were browsed, their size)
+        self._entries = OrderedDict()
+
+    def ttl_for(self, uri, refs):
+        if not refs:
+            return self.empty_ttl
+        service, kind = uri_kind(uri)
+        return self.ttls.get(f"{service}:{kind}", self.ttls.get(kind, self.ttl))
+
+    def stored(self, uri):
+        """Whether uri's listing is kept in the store."""
+        service, kind = uri_kind(uri)
+        # the "all" listings are made from the configured services
+        return service != "all" and kind in self.stored_kinds
+
+    def lookup(self, uri):
+        """The refs for uri and whether they are fresh, or None."""
+        with self._lock:
+            entry = self._entries.get(uri)
+            if entry is not None:
+                self._entries.move_to_end(uri)
+        store = self.store if self.stored(uri) else None
+        if entry is None and store is not None:
+            entry = store.get(uri)
+            if entry is not None:
+                self._remember(uri, *entry)
+        if entry is None:
+            return None
+
+        refs, created = entry[:2]
+        ttl = self.ttl_for(uri, refs)
+        age = time.time() - created
+        # empty listings are not served stale
+        if age >= ttl + (self.max_stale if refs else 0):
+            with self._lock:
+                self._pop(uri)
+            if store is not None:
+                store.delete(uri)
+            return None
+        return refs, age < ttl
+
+    def __getitem__(self, uri):
+        entry = self.lookup(uri)
+        if entry is None:
+            raise KeyError(uri)
+        return entry[0]
+
+    def __contains__(self, uri):
+        return self.lookup(uri) is not None
+
+    def __setitem__(self, uri, refs):
+        store = self.store if self.stored(uri) else None
+        if not self.ttl_for(uri, refs):
+            with self._lock:
+                self._pop(uri)
+            if store is not None:
+                store.delete(uri)
+            return
+        created = time.time()
+        self._remember(uri, refs, created)
+        if store is not None and refs:
+            store.set(uri, refs, created)
+
+    def _remember(self, uri, refs, created):
+        size = getsizeof(refs) + getsizeof(uri)
+        with self._lock:
+            self._pop(uri)
+            self._entries[uri] = (refs, created, size)
+            self.currsize += size
+            while self._entries and (
+                (self.maxsize is not None and len(self._entries) > self.maxsize)
+                or (self.max_bytes and self.currsize > self.max_bytes)
+            ):
+                evicted = next(iter(self._entries))
+                self._pop(evicted)
+                self.evictions += 1
+                logger.debug(f"browse cache evicted {evicted}")
+
+    def _pop(self, uri):
+        # callers hold self._lock
+        entry = self._entries.pop(uri, None)
+        if entry is not None:
+            self.currsize -= entry[2]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.currsize,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.currsize = 0
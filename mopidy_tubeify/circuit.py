@@ -0,0 +1,85 @@
+import threading
+import time
+
+from requests.exceptions import ConnectionError
+
+from mopidy_tubeify import logger
+
+# every service's breaker, by service
+breakers = {}
+_lock = threading.Lock()
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of making a request to a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fast-fails calls to a service that has failed `failures` times in a
+    row, for `cool_down` seconds. After that, one call is let through:
+    if it succeeds the circuit closes, if it fails the circuit opens again.
+    """
+
+    def __init__(self, service, failures=5, cool_down=60.0):
+        self.service = service
+        self.failures = failures
+        self.cool_down = cool_down
+        self.consecutive_failures = 0
+        self.opened = 0
+        self.open_until = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if not self.open_until:
+                return "closed"
+            if self._trial or time.monotonic() >= self.open_until:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        if not self.failures:
+            return True
+        with self._lock:
+            if not self.open_until:
+                return True
+            if self._trial or time.monotonic() < self.open_until:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            closing = bool(self.open_until)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            self._trial = False
+        if closing:
+            logger.info(f"{self.service} is back; circuit closed")
+
+    def failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            opening = (
+                self.failures and self.consecutive_failures >= self.failures
+            ) and (self._trial or not self.open_until)
+            if opening:
+                self.opened += 1
+                self.open_until = time.monotonic() + self.cool_down
+            self._trial = False
+        if opening:
+            logger.warn(
+                f"{self.service} failed {self.consecutive_failures} times in "
+                f"a row; circuit open for {self.cool_down}s"
+            )
+
+
+def breaker(service, failures=5, cool_down=60.0):
+    """The service's breaker, made with these settings if it is new."""
+    with _lock:
+        if service not in breakers:
+            breakers[service] = CircuitBreaker(service, failures, cool_down)
+        return breakers[service]
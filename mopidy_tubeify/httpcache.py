@@ -0,0 +1,199 @@
+import email.utils
+import json
+import sqlite3
+import threading
+import time
+
+from mopidy_tubeify import logger
+from mopidy_tubeify.accesstimes import AccessTimes
+
+# headers of a response that a 304 (Not Modified) may bring up to date
+revalidated_headers = {
+    "cache-control",
+    "date",
+    "etag",
+    "expires",
+    "last-modified",
+}
+
+# headers describing how a response was sent, not what it is; its
+# content is kept decoded
+hop_headers = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def cache_control(headers):
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def freshness(headers, now=None):
+    """
+    How many seconds a response with `headers` is fresh for, by its
+    Cache-Control max-age or its Expires header; None if it is not to be
+    stored at all.
+    """
+    directives = cache_control(headers)
+    if "no-store" in directives or headers.get("Vary", "").strip() == "*":
+        return None
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return max(int(directives["max-age"]), 0)
+        except ValueError:
+            return 0
+    if "Expires" in headers:
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["Expires"])
+            date = (
+                email.utils.parsedate_to_datetime(headers["Date"]).timestamp()
+                if "Date" in headers
+                else now or time.time()
+            )
+            return max(expires.timestamp() - date, 0)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+class HTTPCache:
+    """
+    Disk cache of the services' pages, kept in an SQLite database
+    (normally in the Mopidy cache dir). A page is served from the cache
+    while it is fresh; after that, if it has an ETag or Last-Modified, it
+    is revalidated, and a 304 (Not Modified) is answered from the cache.
+    Once the pages take more than `max_bytes`, the least recently used
+    are evicted.
+    """
+
+    def __init__(self, path, max_bytes=52428800):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.access_times = AccessTimes("responses", "url")
+        self._stats = dict.fromkeys(
+            ["hits", "revalidated", "misses", "stored", "evictions"], 0
+        )
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, "
+                "status INTEGER NOT NULL, "
+                "headers TEXT NOT NULL, "
+                "content BLOB NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "expires REAL NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed "
+                "ON responses (accessed)"
+            )
+            self._evict()
+        logger.debug(f"http cache {path}: {len(self)} pages")
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def size(self):
+        return self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, content, expires FROM responses "
+                "WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.access_times.touch(self._db, url, time.time())
+        status, headers, content, expires = row
+        return {
+            "status": status,
+            "headers": json.loads(headers),
+            "content": content,
+            "expires": expires,
+        }
+
+    def set(self, url, status, headers, content, expires):
+        headers = {
+            name: value
+            for name, value in headers.items()
+            if name.lower() not in hop_headers
+        }
+        size = len(content) + len(url)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    status,
+                    json.dumps(headers),
+                    content,
+                    size,
+                    expires,
+                    time.time(),
+                ),
+            )
+            self._stats["stored"] += 1
+            self._evict()
+
+    def refresh(self, url, headers, expires):
+        """Bring a page up to date with the headers of a 304 for it."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE responses SET headers = ?, expires = ?, accessed = ? "
+                "WHERE url = ?",
+                (json.dumps(headers), expires, time.time(), url),
+            )
+
+    def count(self, result):
+        with self._lock:
+            self._stats[result] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["entries"] = len(self)
+        stats["bytes"] = self.size()
+        return stats
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            if self.access_times:
+                with self._db:
+                    self.access_times.flush(self._db)
+            self._db.close()
+
+    def _evict(self):
+        # callers hold self._lock inside a transaction; keeps the most
+        # recently used pages that fit in max_bytes
+        self.access_times.flush(self._db)
+        if not self.max_bytes:
+            return
+        evicted = self._db.execute(
+            "DELETE FROM responses WHERE url IN ("
+            "SELECT url FROM ("
+            "SELECT url, SUM(size) OVER ("
+            "ORDER BY accessed DESC ROWS UNBOUNDED PRECEDING) AS total "
+            "FROM responses) WHERE total > ?)",
+            (self.max_bytes,),
+        ).rowcount
+        if evicted > 0:
+            self._stats["evictions"] += evicted
+            logger.debug(f"http cache evicted {evicted} pages")
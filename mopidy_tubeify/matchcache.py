@@ -0,0 +1,331 @@
+import json
+import sqlite3
+import threading
+import time
+
+from mopidy_tubeify import logger
+from mopidy_tubeify.accesstimes import AccessTimes
+
+
+def _normalize(text):
+    return " ".join(str(text).lower().split()) if text else ""
+
+
+def match_key(song_name, song_artists, isrc, song_duration=0, video_id=None):
+    # artist order and case/whitespace differ between services for the
+    # same recording, so they are not part of the identity of a match
+    return json.dumps(
+        [
+            _normalize(song_name),
+            sorted(_normalize(artist) for artist in song_artists or []),
+            (isrc or "").upper(),
+            int(song_duration or 0),
+            video_id or "",
+        ],
+        separators=(",", ":"),
+    )
+
+
+# the version of track_record; stores holding records of another version
+# project them again
+track_record_version = 1
+
+
+def track_record(result):
+    # a match, as it is cached, stored and passed on: the parts of a
+    # ytmusic result that browsing, lookup and mopidy-youtube preload data
+    # use. None if it is not a usable match
+    if not result or not result.get("videoId") or not result.get("title"):
+        return None
+    thumbnails = result.get("thumbnails") or (
+        result.get("thumbnail") or {}
+    ).get("thumbnails")
+    duration = result.get("duration_seconds", result.get("lengthSeconds"))
+    album = result.get("album")
+    return {
+        "videoId": result["videoId"],
+        "title": result["title"],
+        "artists": [
+            {"name": artist.get("name"), "id": artist.get("id")}
+            for artist in result.get("artists") or []
+        ],
+        "album": (
+            {"name": album.get("name"), "id": album.get("id")}
+            if album
+            else None
+        ),
+        "duration_seconds": int(duration or 0),
+        "thumbnails": thumbnails[-1:] if thumbnails else [],
+    }
+
+
+class MatchCache:
+    """
+    Durable store of YouTube Music matches, kept in an SQLite database
+    (normally in the Mopidy cache dir) so that matches survive restarts.
+    Entries older than `ttl` seconds are ignored and purged; once there
+    are more than `max_entries`, the least recently used are evicted.
+
+    Searches that found nothing are remembered as misses. A miss is not
+    retried for `negative_ttl` seconds, doubling with every further miss
+    of the same key up to `negative_max_ttl`.
+
+    Matches of tracks with an ISRC also go into an ISRC index, which can
+    be exported to and imported from a file to share it between hosts.
+
+    Matches are stored as yt_matcher leaves them, which is as track
+    records; a database written with another track_record_version has
+    its matches and ISRC records projected again when it is opened.
+    """
+
+    isrc_index_version = 1
+
+    evict_every = 100
+
+    def __init__(
+        self,
+        path,
+        ttl=2592000,
+        max_entries=50000,
+        negative_ttl=3600,
+        negative_max_ttl=604800,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.negative_max_ttl = max(negative_ttl, negative_max_ttl)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.access_times = AccessTimes("matches", "key")
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS matches ("
+                "key TEXT PRIMARY KEY, "
+                "result TEXT NOT NULL, "
+                "created REAL NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS matches_accessed "
+                "ON matches (accessed)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS isrcs ("
+                "isrc TEXT PRIMARY KEY, "
+                "record TEXT NOT NULL, "
+                "updated REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS misses ("
+                "key TEXT PRIMARY KEY, "
+                "attempts INTEGER NOT NULL, "
+                "retry_at REAL NOT NULL)"
+            )
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != track_record_version:
+                self._reproject()
+                self._db.execute(
+                    f"PRAGMA user_version = {track_record_version:d}"
+                )
+            self._evict()
+        logger.debug(f"match cache {path}: {len(self)} entries")
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result, created FROM matches WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                with self._db:
+                    self._db.execute(
+                        "DELETE FROM matches WHERE key = ?", (key,)
+                    )
+                return None
+            self.access_times.touch(self._db, key, now)
+        return json.loads(row[0])
+
+    def set(self, key, result):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now),
+            )
+            self._db.execute("DELETE FROM misses WHERE key = ?", (key,))
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict()
+
+    def is_miss(self, key):
+        # True while a previous miss for key is still backing off
+        if not self.negative_ttl:
+            return False
+        with self._lock:
+            row = self._db.execute(
+                "SELECT retry_at FROM misses WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def set_miss(self, key):
+        if not self.negative_ttl:
+            return
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT attempts FROM misses WHERE key = ?", (key,)
+            ).fetchone()
+            attempts = row[0] + 1 if row else 1
+            backoff = min(
+                self.negative_ttl * 2 ** (attempts - 1),
+                self.negative_max_ttl,
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO misses VALUES (?, ?, ?)",
+                (key, attempts, time.time() + backoff),
+            )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict()
+        logger.debug(f"match cache miss #{attempts} for {key}, {backoff}s")
+
+    def get_isrc(self, isrc):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record FROM isrcs WHERE isrc = ?", (isrc.upper(),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_isrc(self, isrc, result):
+        record = track_record(result)
+        if record:
+            self._upsert_isrcs([(isrc.upper(), record, time.time())])
+
+    def export_isrcs(self, path):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT isrc, record, updated FROM isrcs ORDER BY isrc"
+            ).fetchall()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": self.isrc_index_version,
+                    "isrcs": {
+                        isrc: dict(json.loads(record), updated=updated)
+                        for isrc, record, updated in rows
+                    },
+                },
+                f,
+                separators=(",", ":"),
+            )
+        logger.info(f"exported {len(rows)} isrcs to {path}")
+        return len(rows)
+
+    def import_isrcs(self, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != self.isrc_index_version:
+            logger.warn(f"ignoring isrc index {path}: unknown version")
+            return 0
+        rows = []
+        for isrc, record in data["isrcs"].items():
+            updated = record.pop("updated", 0)
+            record = track_record(record)
+            if record:
+                rows.append((isrc.upper(), record, updated))
+        self._upsert_isrcs(rows)
+        logger.info(f"imported {len(rows)} isrcs from {path}")
+        return len(rows)
+
+    def _upsert_isrcs(self, rows):
+        # the most recently matched record for an isrc wins
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO isrcs VALUES (?, ?, ?) "
+                "ON CONFLICT (isrc) DO UPDATE SET "
+                "record = excluded.record, updated = excluded.updated "
+                "WHERE excluded.updated >= isrcs.updated",
+                [
+                    (isrc, json.dumps(record), updated)
+                    for isrc, record, updated in rows
+                ],
+            )
+
+    def clear(self):
+        with self._lock, self._db:
+            self.access_times.clear()
+            self._db.execute("DELETE FROM matches")
+            self._db.execute("DELETE FROM misses")
+            self._db.execute("DELETE FROM isrcs")
+
+    def close(self):
+        with self._lock:
+            if self.access_times:
+                with self._db:
+                    self.access_times.flush(self._db)
+            self._db.close()
+
+    def _reproject(self):
+        # callers hold self._lock inside a transaction; stored matches and
+        # isrc records become records of the current track_record_version
+        for table, key, column in (
+            ("matches", "key", "result"),
+            ("isrcs", "isrc", "record"),
+        ):
+            rows = self._db.execute(
+                f"SELECT {key}, {column} FROM {table}"
+            ).fetchall()
+            for row_key, value in rows:
+                record = track_record(json.loads(value))
+                if record is None:
+                    self._db.execute(
+                        f"DELETE FROM {table} WHERE {key} = ?", (row_key,)
+                    )
+                else:
+                    self._db.execute(
+                        f"UPDATE {table} SET {column} = ? WHERE {key} = ?",
+                        (json.dumps(record), row_key),
+                    )
+        logger.debug(
+            f"match cache {self.path}: records now version "
+            f"{track_record_version}"
+        )
+
+    def _evict(self):
+        # callers hold self._lock inside a transaction
+        self.access_times.flush(self._db)
+        if self.ttl:
+            self._db.execute(
+                "DELETE FROM matches WHERE created < ?",
+                (time.time() - self.ttl,),
+            )
+        if self.max_entries:
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM matches WHERE key IN ("
+                    "SELECT key FROM matches ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                )
+                logger.debug(f"match cache evicted {excess} entries")
+
+        # a miss is kept for a while after its back-off has run out, so
+        # that a key which keeps missing keeps backing off for longer
+        self._db.execute(
+            "DELETE FROM misses WHERE retry_at < ?",
+            (time.time() - self.negative_max_ttl,),
+        )
+        if self.max_entries:
+            self._db.execute(
+                "DELETE FROM misses WHERE key IN ("
+                "SELECT key FROM misses ORDER BY retry_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
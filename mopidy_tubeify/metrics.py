@@ -0,0 +1,324 @@
+import bisect
+import threading
+from collections import Counter, defaultdict
+
+from mopidy_tubeify import circuit, timing
+
+latency_buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+calls_buckets = (0, 1, 5, 10, 25, 50, 100, 250, 500)
+circuit_states = ("closed", "half-open", "open")
+
+# sized caches to report the entries of, by name; registered by their
+# owners (the browse cache, the matcher's caches, the match store). Those
+# with a stats() also report their bytes and evictions
+caches = {}
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels=""):
+        # cumulative, as prometheus expects
+        bucket_labels = f"{labels}," if labels else ""
+        labels = f"{{{labels}}}" if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{bucket_labels}le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{labels} {self.sum}"
+        yield f"{name}_count{labels} {cumulative}"
+
+
+_responses = Counter()
+_errors = Counter()
+_request_latency = defaultdict(lambda: Histogram(latency_buckets))
+_browse_ytm_calls = Histogram(calls_buckets)
+
+
+def record_response(service, status, seconds):
+    with _lock:
+        _responses[(service, status)] += 1
+        _request_latency[service].observe(seconds)
+
+
+def record_error(service):
+    # a request that got no response: it failed, or its circuit was open
+    with _lock:
+        _errors[service] += 1
+
+
+def record_browse(trace):
+    calls = sum(
+        n for name, n in trace.counters.items() if name.startswith("ytm_")
+    )
+    with _lock:
+        _browse_ytm_calls.observe(calls)
+
+
+def _metric(name, kind, help, samples):
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {kind}"
+    yield from samples
+
+
+def _lines():
+    from mopidy_tubeify import yt_matcher
+
+    with _lock:
+        responses = dict(_responses)
+        errors = dict(_errors)
+        request_latency = {
+            service: list(
+                histogram.samples(
+                    "tubeify_http_request_duration_seconds",
+                    f'service="{service}"',
+                )
+            )
+            for service, histogram in _request_latency.items()
+        }
+        browse_ytm_calls = list(
+            _browse_ytm_calls.samples("tubeify_browse_ytm_calls")
+        )
+
+    requests = Counter(errors)
+    for (service, _), count in responses.items():
+        requests[service] += count
+
+    yield from _metric(
+        "tubeify_http_requests_total",
+        "counter",
+        "HTTP requests made to each service",
+        (
+            f'tubeify_http_requests_total{{service="{service}"}} {count}'
+            for service, count in sorted(requests.items())
+        ),
+    )
+    yield from _metric(
+        "tubeify_http_responses_total",
+        "counter",
+        "HTTP responses from each service, by status code",
+        (
+            f"tubeify_http_responses_total"
+            f'{{service="{service}",code="{status}"}} {count}'
+            for (service, status), count in sorted(responses.items())
+        ),
+    )
+    yield from _metric(
+        "tubeify_http_errors_total",
+        "counter",
+        "HTTP requests to each service that got no response",
+        (
+            f'tubeify_http_errors_total{{service="{service}"}} {count}'
+            for service, count in sorted(errors.items())
+        ),
+    )
+    yield from _metric(
+        "tubeify_http_request_duration_seconds",
+        "histogram",
+        "time to each service's response",
+        (
+            sample
+            for _, samples in sorted(request_latency.items())
+            for sample in samples
+        ),
+    )
+    breakers = sorted(circuit.breakers.items())
+    yield from _metric(
+        "tubeify_circuit_state",
+        "gauge",
+        "each service's circuit: 0 closed, 1 half-open, 2 open",
+        (
+            f'tubeify_circuit_state{{service="{service}"}} '
+            f"{circuit_states.index(breaker.state)}"
+            for service, breaker in breakers
+        ),
+    )
+    yield from _metric(
+        "tubeify_circuit_opened_total",
+        "counter",
+        "times each service's circuit has opened",
+        (
+            f'tubeify_circuit_opened_total{{service="{service}"}} '
+            f"{breaker.opened}"
+            for service, breaker in breakers
+        ),
+    )
+    yield from _metric(
+        "tubeify_browse_ytm_calls",
+        "histogram",
+        "YouTube Music calls made by each browse",
+        browse_ytm_calls,
+    )
+
+    stats = yt_matcher.matcher_stats()
+    lookups = stats.get("lookups", 0)
+    hits = {
+        cache: stats.get(f"{cache}_hits", 0)
+        for cache in ("memory", "store", "isrc", "negative")
+    }
+    yield from _metric(
+        "tubeify_matcher_lookups_total",
+        "counter",
+        "tracks looked up by the matcher",
+        [f"tubeify_matcher_lookups_total {lookups}"],
+    )
+    yield from _metric(
+        "tubeify_matcher_cache_hits_total",
+        "counter",
+        "matcher lookups answered by each cache",
+        (
+            f'tubeify_matcher_cache_hits_total{{cache="{cache}"}} {count}'
+            for cache, count in hits.items()
+        ),
+    )
+    yield from _metric(
+        "tubeify_matcher_cache_hit_ratio",
+        "gauge",
+        "fraction of matcher lookups answered without YouTube Music",
+        [
+            "tubeify_matcher_cache_hit_ratio "
+            f"{sum(hits.values()) / lookups if lookups else 0}"
+        ],
+    )
+
+    flights = yt_matcher.ytm_flights.stats()
+    yield from _metric(
+        "tubeify_ytm_calls_total",
+        "counter",
+        "YouTube Music calls issued, by kind",
+        (
+            f'tubeify_ytm_calls_total{{kind="{kind}"}} {counts["issued"]}'
+            for kind, counts in sorted(flights.items())
+        ),
+    )
+    yield from _metric(
+        "tubeify_ytm_coalesced_total",
+        "counter",
+        "YouTube Music calls saved by joining an identical call in flight",
+        (
+            f'tubeify_ytm_coalesced_total{{kind="{kind}"}} '
+            f'{counts["coalesced"]}'
+            for kind, counts in sorted(flights.items())
+        ),
+    )
+
+    scheduler = yt_matcher.scheduler.stats()
+    for name, help in (
+        ("tasks", "matcher tasks queued or running"),
+        ("in_flight", "YouTube Music calls in flight"),
+        ("concurrency_limit", "YouTube Music calls allowed in flight"),
+    ):
+        yield from _metric(
+            f"tubeify_matcher_{name}",
+            "gauge",
+            help,
+            [f"tubeify_matcher_{name} {scheduler[name]}"],
+        )
+    yield from _metric(
+        "tubeify_ytm_throttled_total",
+        "counter",
+        "YouTube Music calls throttled",
+        [f"tubeify_ytm_throttled_total {scheduler['throttled']}"],
+    )
+
+    yield from _metric(
+        "tubeify_cache_entries",
+        "gauge",
+        "entries in each cache",
+        (
+            f'tubeify_cache_entries{{cache="{name}"}} {len(cache)}'
+            for name, cache in sorted(caches.items())
+        ),
+    )
+
+    sized = cache_stats()
+    yield from _metric(
+        "tubeify_cache_bytes",
+        "gauge",
+        "size of each cache with a byte budget",
+        (
+            f'tubeify_cache_bytes{{cache="{name}"}} {stats["bytes"]}'
+            for name, stats in sorted(sized.items())
+        ),
+    )
+    yield from _metric(
+        "tubeify_cache_evictions_total",
+        "counter",
+        "entries evicted from each cache with a byte budget",
+        (
+            f'tubeify_cache_evictions_total{{cache="{name}"}} '
+            f'{stats["evictions"]}'
+            for name, stats in sorted(sized.items())
+        ),
+    )
+
+    # its bytes and evictions are in the families above, as cache="http"
+    http_cache = caches.get("http")
+    if http_cache is not None:
+        stats = http_cache.stats()
+        yield from _metric(
+            "tubeify_http_cache_total",
+            "counter",
+            "service requests answered from the page cache (hits and "
+            "revalidated) or not (misses)",
+            (
+                f'tubeify_http_cache_total{{result="{result}"}} {stats[result]}'
+                for result in ("hits", "revalidated", "misses")
+            ),
+        )
+
+    stages = timing.stats()["stages"]
+    yield from _metric(
+        "tubeify_stage_seconds_total",
+        "counter",
+        "time spent in each stage of browsing",
+        (
+            f'tubeify_stage_seconds_total{{stage="{stage}"}} '
+            f'{totals["seconds"]}'
+            for stage, totals in sorted(stages.items())
+        ),
+    )
+    yield from _metric(
+        "tubeify_stage_total",
+        "counter",
+        "times each stage of browsing has run",
+        (
+            f'tubeify_stage_total{{stage="{stage}"}} {totals["count"]}'
+            for stage, totals in sorted(stages.items())
+        ),
+    )
+
+
+def cache_stats():
+    """
+    The entries, bytes and evictions of each registered cache that keeps
+    count of them, by name.
+    """
+    return {
+        name: cache.stats()
+        for name, cache in list(caches.items())
+        if hasattr(cache, "stats")
+    }
+
+
+def render():
+    """All metrics, in the prometheus text exposition format."""
+    return "\n".join(_lines()) + "\n"
+
+
+def reset():
+    global _browse_ytm_calls
+    with _lock:
+        _responses.clear()
+        _errors.clear()
+        _request_latency.clear()
+        _browse_ytm_calls = Histogram(calls_buckets)
@@ -0,0 +1,45 @@
+import string
+from functools import lru_cache
+
+from unidecode import unidecode
+
+# the same song, artist and result strings are normalized over and over
+# (for every search of a track, every result of a search, every album
+# check), so each of these is memoized
+cache_size = 16384
+
+punctuation_table = str.maketrans("", "", string.punctuation)
+
+# hyphens separate words in titles, so they become spaces
+title_table = str.maketrans("-", " ", string.punctuation.replace("-", ""))
+
+
+@lru_cache(maxsize=cache_size)
+def normalize(text: str) -> str:
+    """lower case ASCII transliteration of text, without punctuation"""
+    return unidecode(text).translate(punctuation_table).lower()
+
+
+@lru_cache(maxsize=cache_size)
+def fold(text: str) -> str:
+    """lower case ASCII transliteration of text"""
+    return unidecode(text.lower())
+
+
+@lru_cache(maxsize=cache_size)
+def strip_punctuation(text: str) -> str:
+    """lower case text, without punctuation"""
+    return text.translate(punctuation_table).lower()
+
+
+@lru_cache(maxsize=cache_size)
+def title_words(text: str) -> str:
+    """lower case text, without punctuation, with hyphens as spaces"""
+    return text.translate(title_table).lower()
+
+
+def cache_info():
+    return {
+        function.__name__: function.cache_info()
+        for function in (normalize, fold, strip_punctuation, title_words)
+    }
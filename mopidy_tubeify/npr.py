@@ -22,7 +22,8 @@ class NPR(ServiceClient):
             "container": {"name": "div", "attrs": {"id": "storytext"}},
             # "item": {"tag": "li", "attrs": {}},  # it seems that nmf pages are just text lists with numbers or dots; not html lists
         },
-        "nprjson": {"item": {"name": "h6", "attrs": {}}},
+        # _get_NPR_json reads the tags following each h6
+        "nprjson": {"item": {"name": "h6", "attrs": {}}, "strain": False},
         "nprpl": {
             "item": {
                 "name": "article",
@@ -0,0 +1,60 @@
+import json
+
+
+def preload_record(track):
+    """
+    The parts of a matched track that mopidy-youtube reads from preload
+    data (see its ytm_item_to_video): videoId, title, duration, artists,
+    album, track_no and the last of the thumbnails.
+    """
+    record = {"videoId": track["videoId"], "title": track["title"]}
+
+    if track.get("duration"):
+        record["duration"] = track["duration"]
+    elif track.get("duration_seconds"):
+        record["lengthSeconds"] = track["duration_seconds"]
+    else:
+        for key in ("length", "lengthMs", "lengthSeconds"):
+            if key in track:
+                record[key] = track[key]
+                break
+
+    artists = track.get("artists")
+    if artists and isinstance(artists, list):
+        record["artists"] = [
+            {"name": artist.get("name"), "id": artist.get("id")}
+            for artist in artists
+        ]
+    elif artists:
+        record["artists"] = artists
+    elif track.get("byline") or track.get("author"):
+        record["author"] = track.get("byline") or track.get("author")
+
+    album = track.get("album")
+    if album:
+        record["album"] = {"name": album.get("name"), "id": album.get("id")}
+
+    if track.get("track_no") is not None:
+        record["track_no"] = track["track_no"]
+
+    thumbnails = track.get("thumbnails") or (track.get("thumbnail") or {}).get(
+        "thumbnails"
+    )
+    if thumbnails:
+        record["thumbnails"] = thumbnails[-1:]
+
+    return record
+
+
+def preload_uri(video_id, tracks):
+    """
+    The uri of video_id, carrying preload data for tracks. mopidy-youtube
+    only reads preload data as hex encoded JSON, so the data is kept small
+    instead: just the parts it reads, compactly serialised.
+    """
+    data = json.dumps(
+        [preload_record(track) for track in tracks],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return f"yt:video:{video_id}:preload:{data.encode('utf-8').hex()}"
@@ -0,0 +1,92 @@
+import importlib
+import threading
+from collections.abc import Mapping
+
+from mopidy_tubeify import logger
+
+
+class ServiceRegistry(Mapping):
+    """
+    The services, by service_uri, each made on first use. Making some
+    services involves the network (FMSpins logs in, for one), so none of
+    them are made until they are needed, or until warm_up makes them in
+    the background. A service's client can be registered by the path of
+    its module, "module:Class", to put off importing it too.
+    """
+
+    def __init__(self):
+        self._classes = {}
+        self._arguments = {}
+        self._details = {}
+        self._services = {}
+        self._locks = {}
+
+    def register(
+        self, service_uri, service, *args, name=None, image=None, **kwargs
+    ):
+        """
+        Register the client `service` (a class or "module:Class") to be
+        made with `args` and `kwargs`. `name` and `image` default to the
+        client's service_name and service_image.
+        """
+        self._classes[service_uri] = service
+        self._arguments[service_uri] = (args, kwargs)
+        self._details[service_uri] = (name, image)
+        self._locks[service_uri] = threading.Lock()
+
+    def service_class(self, service_uri):
+        service = self._classes[service_uri]
+        if isinstance(service, str):
+            module, _, name = service.partition(":")
+            service = getattr(importlib.import_module(module), name)
+            self._classes[service_uri] = service
+        return service
+
+    def __getitem__(self, service_uri):
+        try:
+            return self._services[service_uri]
+        except KeyError:
+            pass
+        with self._locks[service_uri]:
+            if service_uri not in self._services:
+                logger.debug(f"starting service {service_uri}")
+                args, kwargs = self._arguments[service_uri]
+                self._services[service_uri] = self.service_class(service_uri)(
+                    *args, **kwargs
+                )
+            return self._services[service_uri]
+
+    def __contains__(self, service_uri):
+        return service_uri in self._classes
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self):
+        return len(self._classes)
+
+    def name(self, service_uri):
+        name, _ = self._details[service_uri]
+        return name or self.service_class(service_uri).service_name
+
+    def image(self, service_uri):
+        _, image = self._details[service_uri]
+        return image or self.service_class(service_uri).service_image
+
+    def started(self, service_uri):
+        """The service, if it has been made, else None."""
+        return self._services.get(service_uri)
+
+    def warm_up(self):
+        """Make all of the services, in a background thread."""
+
+        def warm_up():
+            for service_uri in self:
+                try:
+                    self[service_uri]
+                except Exception as e:
+                    logger.error(f"error starting service {service_uri}: {e}")
+
+        threading.Thread(
+            target=warm_up, name="TubeifyWarmUp", daemon=True
+        ).start()
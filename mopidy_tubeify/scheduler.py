@@ -0,0 +1,175 @@
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from mopidy_tubeify import logger
+
+
+def is_throttled(error):
+    response = getattr(error, "response", None)
+    return (
+        getattr(response, "status_code", None) == 429
+        or "429" in str(error)
+        or "Too Many Requests" in str(error)
+    )
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second, in bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    Limits concurrency to a level found by AIMD: the limit grows by about
+    one for every `limit` calls that complete within `target_latency`
+    seconds, and halves when a call is throttled or fails.
+    """
+
+    def __init__(self, initial, minimum, maximum, target_latency):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, failed=False):
+        with self._condition:
+            self.in_flight -= 1
+            if failed:
+                limit = max(self.minimum, self.limit / 2)
+                if int(limit) < int(self.limit):
+                    logger.debug(f"youtube music concurrency down to {limit}")
+                self.limit = limit
+            elif latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class MatcherScheduler:
+    """
+    Process-wide scheduler for matching against YouTube Music. Matching
+    tasks run on a shared pool of `max_workers` threads; the YouTube Music
+    calls they make are rate limited by a token bucket and their
+    concurrency by an AdaptiveLimiter. Throttled calls are retried, with
+    exponential back-off, up to `retries` times.
+    """
+
+    retry_delay = 1.0
+
+    def __init__(
+        self,
+        max_workers=8,
+        initial_concurrency=4,
+        rate=5.0,
+        burst=10,
+        target_latency=2.0,
+        retries=3,
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="TubeifyMatcher"
+        )
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AdaptiveLimiter(
+            initial_concurrency, 1, max_workers, target_latency
+        )
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._throttled = 0
+        self._errors = 0
+        self._tasks = 0
+
+    def _task(self, function, queued):
+        # counts the tasks queued or running
+        with self._lock:
+            self._tasks += queued
+
+        def task(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._tasks -= 1
+
+        return task
+
+    def map(self, function, items):
+        items = list(items)
+        return self.executor.map(self._task(function, len(items)), items)
+
+    def submit(self, function, *args, **kwargs):
+        return self.executor.submit(self._task(function, 1), *args, **kwargs)
+
+    def call(self, function, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self.limiter.release(time.monotonic() - start, failed=True)
+                throttled = is_throttled(e)
+                with self._lock:
+                    self._calls += 1
+                    if throttled:
+                        self._throttled += 1
+                    else:
+                        self._errors += 1
+                if not throttled or attempt >= self.retries:
+                    raise
+                delay = self.retry_delay * 2**attempt
+                logger.warn(f"youtube music throttled, retrying in {delay}s")
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.limiter.release(time.monotonic() - start)
+                with self._lock:
+                    self._calls += 1
+                return result
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "throttled": self._throttled,
+                "errors": self._errors,
+                "tasks": self._tasks,
+                "in_flight": self.limiter.in_flight,
+                "concurrency_limit": int(self.limiter.limit),
+            }
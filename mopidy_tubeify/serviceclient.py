@@ -1,8 +1,177 @@
-from bs4 import BeautifulSoup as bs
-from mopidy_youtube.comms import Client
+import datetime
+import re
+import time
 
-from mopidy_tubeify import logger
+from bs4 import BeautifulSoup as bs
+from bs4 import FeatureNotFound, SoupStrainer
+from mopidy_youtube.comms import Client, MyHTTPAdapter
 from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from mopidy_tubeify import circuit, httpcache, logger, metrics, timing
+
+# the SoupStrainers compiled from service_schemas, by (client, items_type)
+_strainers = {}
+
+
+def _class_matcher(wanted):
+    # find_all matches each of a tag's classes, but a SoupStrainer is
+    # given the class attribute as it is written, "one two"
+    def matches(value):
+        if value is None:
+            return False
+        for candidate in [value, *value.split()]:
+            if isinstance(wanted, re.Pattern):
+                if wanted.search(candidate):
+                    return True
+            elif isinstance(wanted, str):
+                if candidate == wanted:
+                    return True
+            elif candidate in wanted:
+                return True
+        return False
+
+    return matches
+
+
+def compile_strainer(schema):
+    """
+    A SoupStrainer for the outermost tag that `schema` looks for (its
+    container, else its items), so that only those tags are parsed.
+    Matching the tags' strings is left to _select. None for schemas with
+    "strain": False, whose callers find their way around the rest of the
+    page from the items.
+    """
+    tag = schema.get("container") or schema.get("item")
+    if not tag or schema.get("strain") is False:
+        return None
+    attrs = dict(tag.get("attrs", {}))
+    if "class" in attrs:
+        attrs["class"] = _class_matcher(attrs["class"])
+    return SoupStrainer(tag.get("name"), attrs)
+
+
+class ServiceAdapter(MyHTTPAdapter):
+    """
+    Gives a service's requests its connect and read deadlines (unless the
+    request has its own), records their responses and failures for
+    metrics, and fails them fast while the service's circuit is open.
+    With ServiceClient.http_cache, GETs are answered from the cache while
+    they are fresh, and revalidated with the cached ETag or Last-Modified
+    once they are not.
+    """
+
+    def __init__(self, service, timeout, breaker, **kwargs):
+        super().__init__(**kwargs)
+        self.service = service
+        self.timeout = timeout
+        self.breaker = breaker
+
+    def send(self, request, timeout=None, **kwargs):
+        cache = ServiceClient.http_cache
+        cached = None
+        if (
+            cache is not None
+            and request.method == "GET"
+            and "Authorization" not in request.headers
+            and not kwargs.get("stream")
+        ):
+            cached = cache.get(request.url)
+            if cached and cached["expires"] > time.time():
+                cache.count("hits")
+                return self._cached_response(request, cached)
+            if cached:
+                headers = CaseInsensitiveDict(cached["headers"])
+                if "ETag" in headers:
+                    request.headers["If-None-Match"] = headers["ETag"]
+                if "Last-Modified" in headers:
+                    request.headers["If-Modified-Since"] = headers[
+                        "Last-Modified"
+                    ]
+        else:
+            cache = None
+
+        if not self.breaker.allow():
+            metrics.record_error(self.service)
+            raise circuit.CircuitOpenError(
+                f"{self.service} circuit is open", request=request
+            )
+        try:
+            response = super().send(
+                request, timeout=timeout or self.timeout, **kwargs
+            )
+        except Exception:
+            self.breaker.failure()
+            metrics.record_error(self.service)
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        metrics.record_response(
+            self.service, response.status_code, response.elapsed.total_seconds()
+        )
+        if cache is not None:
+            return self._cache_response(cache, request, response, cached)
+        return response
+
+    def _freshness(self, headers):
+        seconds = httpcache.freshness(headers)
+        if seconds is None:
+            return None
+        return max(
+            seconds, ServiceClient.http_cache_min_fresh.get(self.service, 0)
+        )
+
+    def _cache_response(self, cache, request, response, cached):
+        if cached and response.status_code == 304:
+            headers = CaseInsensitiveDict(cached["headers"])
+            headers.update(
+                (name, value)
+                for name, value in response.headers.items()
+                if name.lower() in httpcache.revalidated_headers
+            )
+            seconds = self._freshness(headers) or 0
+            cache.refresh(request.url, dict(headers), time.time() + seconds)
+            cache.count("revalidated")
+            # a 304 has no content, but reading it frees the connection
+            response.content
+            return self._cached_response(
+                request, dict(cached, headers=dict(headers))
+            )
+
+        cache.count("misses")
+        seconds = self._freshness(response.headers)
+        if response.status_code == 200 and seconds is not None:
+            if seconds or any(
+                validator in response.headers
+                for validator in ("ETag", "Last-Modified")
+            ):
+                cache.set(
+                    request.url,
+                    response.status_code,
+                    dict(response.headers),
+                    response.content,
+                    time.time() + seconds,
+                )
+        return response
+
+    def _cached_response(self, request, cached):
+        response = Response()
+        response.status_code = cached["status"]
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(cached["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = cached["content"]
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.timedelta(0)
+        response.from_cache = True
+        return response
+
 
 class ServiceClient(Client):
     service_uri = None
@@ -12,10 +181,55 @@ class ServiceClient(Client):
     service_schema = {}
     uri_images = {}
 
+    # deadlines (connect, read) and circuit breaker settings; the backend
+    # sets these from the config before making any services
+    service_deadline = (6.05, 27)
+    service_deadlines = {}
+    circuit_failures = 5
+    circuit_cool_down = 60.0
+
+    # the disk cache of pages (see httpcache.HTTPCache), if any, and the
+    # least time, by service, for which a page is taken to be fresh
+    http_cache = None
+    http_cache_min_fresh = {}
+
+    # the Mopidy cache dir, for services to keep things in; set by the
+    # backend
+    cache_dir = None
+
+    # parsers for _get_items_soup; html_parser is set from the config,
+    # and becomes fallback_parser if it isn't installed
+    html_parser = "lxml"
+    fallback_parser = "html5lib"
+
     def __init__(self, proxy, headers, ytm_client):
         super().__init__(proxy, headers)
         self.ytmusic = ytm_client
 
+        # each class has its own session (see Client); its adapter is
+        # replaced once, keeping the retries and pool size
+        adapter = self.session.get_adapter("https://")
+        if not isinstance(adapter, ServiceAdapter):
+            service = type(self).service_uri or type(self).__name__.lower()
+            adapter = ServiceAdapter(
+                service,
+                self.service_deadlines.get(service, self.service_deadline),
+                circuit.breaker(
+                    service, self.circuit_failures, self.circuit_cool_down
+                ),
+                max_retries=adapter.max_retries,
+                pool_maxsize=adapter._pool_maxsize,
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+    @classmethod
+    def _create_session(cls, proxy, headers, **kwargs):
+        # Client sets the same headers dict on every class's session, so
+        # headers one service sets (cookies, tokens) would go with every
+        # other service's requests; each session gets its own copy
+        super()._create_session(proxy, dict(headers or {}), **kwargs)
+
     def get_users_details(self, users):
         logger.warn(f"no details, get_users_details: {users}")
         return []
@@ -37,6 +251,34 @@ class ServiceClient(Client):
         logger.warn("no service homepage, get_service_homepage")
         return
 
+    def _strainer(self, items_type):
+        key = (type(self), items_type)
+        if key not in _strainers:
+            _strainers[key] = compile_strainer(self.service_schema[items_type])
+        return _strainers[key]
+
+    def _parse(self, content, parser, parse_only=None):
+        with timing.stage("parse"):
+            try:
+                return bs(content, parser, parse_only=parse_only)
+            except FeatureNotFound:
+                fallback = self.fallback_parser
+                logger.warn(f"{parser} is not installed, using {fallback}")
+                ServiceClient.html_parser = fallback
+                return bs(content, fallback)
+
+    def _select(self, soup, schema):
+        with timing.stage("select"):
+            if soup:
+                if "container" in schema:
+                    soup = soup.find(**schema["container"])
+
+            if soup:
+                if "item" in schema:
+                    soup = soup.find_all(**schema["item"])
+                return soup
+            return []
+
     def _get_items_soup(self, endpoint, items_type=""):
         schema = {}
 
@@ -44,25 +286,36 @@ class ServiceClient(Client):
             schema = self.service_schema[items_type]
 
         if isinstance(endpoint, bs):
-            soup = endpoint
+            return self._select(endpoint, schema)
         elif isinstance(endpoint, Response):
-            soup = bs(
-                endpoint.content.decode("utf-8"), "html5lib"
-            )
+            content = endpoint.content.decode("utf-8")
         else:
-            data = self.session.get(f"{self.service_endpoint}{endpoint}")
-            soup = bs(
-                data.content.decode("utf-8"), "html5lib"
-            )  # is .content.decode('utf-8') always going to work?
+            with timing.stage("fetch"):
+                data = self.session.get(f"{self.service_endpoint}{endpoint}")
+            # is .content.decode('utf-8') always going to work?
+            content = data.content.decode("utf-8")
 
         # with open('/tmp/output.html', 'w', encoding='utf-8') as file:
-        #     file.write(str(soup))
-        if soup:
-            if "container" in schema:
-                soup = soup.find(**schema["container"])
-
-        if soup:
-            if "item" in schema:
-                soup = soup.find_all(**schema["item"])
-            return soup
-        return []
+        #     file.write(content)
+
+        # whole pages are for the caller to find its way around, so they
+        # are parsed by html5lib, as a browser would; when the schema says
+        # what is wanted, the faster parser is tried first, and only
+        # builds the tags the schema looks for (html5lib can't do that)
+        if not schema or self.html_parser == self.fallback_parser:
+            return self._select(
+                self._parse(content, self.fallback_parser), schema
+            )
+
+        items = self._select(
+            self._parse(
+                content, self.html_parser, parse_only=self._strainer(items_type)
+            ),
+            schema,
+        )
+        if not items:
+            timing.count("parser_fallbacks")
+            items = self._select(
+                self._parse(content, self.fallback_parser), schema
+            )
+        return items
@@ -0,0 +1,57 @@
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: while a call is in
+    flight, later callers with that key wait for it and share its result
+    (or exception) instead of making the call again. Counts are kept per
+    kind of call, of calls issued and of calls saved by coalescing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._issued = Counter()
+        self._coalesced = Counter()
+
+    def do(self, kind, key, function, *args, **kwargs):
+        with self._lock:
+            future = self._in_flight.get((kind, key))
+            leader = future is None
+            if leader:
+                future = self._in_flight[(kind, key)] = Future()
+                self._issued[kind] += 1
+            else:
+                self._coalesced[kind] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[(kind, key)]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def stats(self):
+        with self._lock:
+            return {
+                kind: {
+                    "issued": self._issued[kind],
+                    "coalesced": self._coalesced[kind],
+                }
+                for kind in self._issued | self._coalesced
+            }
@@ -0,0 +1,134 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from mopidy.models import ImmutableObject
+
+from mopidy_tubeify import logger
+
+
+def getsizeof(value, _seen=None):
+    """
+    An estimate of the bytes of memory value takes, with everything it
+    refers to: its dicts, lists, tuples and sets, and the fields of mopidy
+    models, each counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            getsizeof(key, _seen) + getsizeof(item, _seen)
+            for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(getsizeof(item, _seen) for item in value)
+    elif isinstance(value, ImmutableObject):
+        size += sum(
+            getsizeof(getattr(value, field), _seen) for field in value._fields
+        )
+    return size
+
+
+class SizedTTLCache(MutableMapping):
+    """
+    A cache whose entries expire after `ttl` seconds, and whose least
+    recently used entries are evicted once they take more than
+    `max_bytes` of memory (0 for no limit), as measured by getsizeof. A
+    value larger than max_bytes isn't kept at all. Can be used with
+    cachetools' cached.
+    """
+
+    def __init__(self, max_bytes, ttl, getsizeof=getsizeof):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.getsizeof = getsizeof
+        self.currsize = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (value, size, expires)
+        self._entries = OrderedDict()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value, size, expires = self._entries[key]
+            if expires <= time.monotonic():
+                self._pop(key)
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        size = self.getsizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            raise ValueError("value too large")
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.currsize += size
+            self._evict()
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.currsize = 0
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return {
+                "entries": len(self._entries),
+                "bytes": self.currsize,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+    def _pop(self, key):
+        # callers hold self._lock
+        _, size, _ = self._entries.pop(key)
+        self.currsize -= size
+
+    def _expire(self):
+        # callers hold self._lock
+        now = time.monotonic()
+        for key, (_, _, expires) in list(self._entries.items()):
+            if expires <= now:
+                self._pop(key)
+
+    def _evict(self):
+        # callers hold self._lock; expired entries go first, then the
+        # least recently used until the rest fit in max_bytes
+        if not self.max_bytes or self.currsize <= self.max_bytes:
+            return
+        self._expire()
+        evicted = 0
+        while self.currsize > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+            evicted += 1
+        if evicted:
+            self.evictions += evicted
+            logger.debug(f"cache evicted {evicted} entries")
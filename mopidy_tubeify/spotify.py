@@ -1,8 +1,11 @@
 import json
 import re
+import threading
+import time
 
 from bs4 import BeautifulSoup as bs
 
+from mopidy_tubeify import logger
 from mopidy_tubeify.data import find_in_obj
 from mopidy_tubeify.serviceclient import ServiceClient
 from mopidy_tubeify.yt_matcher import search_and_get_best_match
@@ -10,6 +13,11 @@ from mopidy_tubeify.yt_matcher import search_and_get_best_match
 # from oauthlib.oauth2 import BackendApplicationClient
 # from requests_oauthlib import OAuth2Session
 
+# the anonymous access tokens from the web player, by endpoint; shared by
+# every client that borrows Spotify's methods (FarOut, NPR, WhatHiFi)
+_tokens = {}
+_tokens_lock = threading.Lock()
+
 
 class Spotify(ServiceClient):
     playlist_regex = re.compile(
@@ -35,18 +43,50 @@ class Spotify(ServiceClient):
         },
     }
 
-    def get_spotify_headers(self, endpoint=r"https://open.spotify.com"):
-        # # Getting the access token first to send it with the header to the api endpoint
+    # a token is refreshed this many seconds before it expires
+    token_margin = 60
+
+    def _get_access_token(self, endpoint, expired=None):
+        # the cached token, unless it is (nearly) expired or it is the
+        # `expired` token, that a request has just been refused with
+        with _tokens_lock:
+            token = _tokens.get(endpoint)
+            if (
+                token
+                and token["access_token"] != expired
+                and token["expires"] - Spotify.token_margin > time.time()
+            ):
+                return token["access_token"]
+
+            # use temporary token from website
+            headers = {
+                "User-Agent": (
+                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                    "AppleWebKit/537.36 (KHTML, like Gecko) "
+                    "Chrome/103.0.0.0 Safari/537.36"
+                )
+            }
+            page = self.session.get(f"{endpoint}/__noul__", headers=headers)
+            soup = bs(page.text, "html.parser")
+            access_token_tag = soup.find(
+                "script", string=re.compile("accessToken")
+            )
+            json_obj = json.loads(access_token_tag.contents[0])
+            _tokens[endpoint] = {
+                "access_token": json_obj["accessToken"],
+                "expires": json_obj.get("accessTokenExpirationTimestampMs", 0)
+                / 1000,
+            }
+            logger.debug("refreshed spotify access token")
+            return json_obj["accessToken"]
 
-        # use temporary token from website
-        headers = {
-            "User-Agent": r"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/103.0.0.0 Safari/537.36"
+    def get_spotify_headers(
+        self, endpoint=r"https://open.spotify.com", expired=None
+    ):
+        # # Getting the access token first to send it with the header to the api endpoint
+        token = {
+            "access_token": Spotify._get_access_token(self, endpoint, expired)
         }
-        page = self.session.get(f"{endpoint}/__noul__", headers=headers)
-        soup = bs(page.text, "html.parser")
-        access_token_tag = soup.find("script", string=re.compile("accessToken"))
-        json_obj = json.loads(access_token_tag.contents[0])
-        token = {"access_token": json_obj["accessToken"]}
 
         # # use oauth2 to get token; doesn't allow access to spotify homepage
         # # at https://api.spotify.com/v1/views/desktop-home
@@ -61,22 +101,31 @@ class Spotify(ServiceClient):
         #     client_secret=creds["client_secret"],
         # )
 
-        self.session.headers.update(
-            {
-                "authorization": f"Bearer {token['access_token']}",
-                "referer": endpoint,
-                "accept": "application/json",
-                "app-platform": "WebPlayer",
-            }
-        )
-        return
+        # the headers are sent with each request, not set on the
+        # session, so that other requests don't carry the token
+        return {
+            "authorization": f"Bearer {token['access_token']}",
+            "referer": endpoint,
+            "accept": "application/json",
+            "app-platform": "WebPlayer",
+        }
+
+    def _spotify_get(self, endpoint):
+        # the token can be revoked before it expires; if it is refused,
+        # get a new one and try again
+        headers = Spotify.get_spotify_headers(self)
+        response = self.session.get(endpoint, headers=headers)
+        if response.status_code == 401:
+            expired = headers["authorization"][len("Bearer ") :]
+            headers = Spotify.get_spotify_headers(self, expired=expired)
+            response = self.session.get(endpoint, headers=headers)
+        return response.json()
 
     def get_users_details(self, users):
-        self.get_spotify_headers()
 
         def job(user):
             endpoint = f"{Spotify.service_endpoint}/v1/users/{user}"
-            data = self.session.get(endpoint).json()
+            data = Spotify._spotify_get(self, endpoint)
             data["name"] = data["display_name"]
             return data
 
@@ -87,8 +136,7 @@ class Spotify(ServiceClient):
 
     def get_user_playlists(self, user):
         endpoint = f"{Spotify.service_endpoint}/v1/users/{user}/playlists"
-        self.get_spotify_headers()
-        data = self.session.get(endpoint).json()
+        data = Spotify._spotify_get(self, endpoint)
         playlists = data["items"]
         return [
             {"name": playlist["name"], "id": playlist["id"]}
@@ -97,11 +145,10 @@ class Spotify(ServiceClient):
 
     def _get_spotify_details(self, kind, tracklist):
         endpoint = f"{Spotify.service_endpoint}/v1/{kind}/{tracklist}"
-        data = self.session.get(endpoint).json()
+        data = Spotify._spotify_get(self, endpoint)
         return data
 
     def get_playlists_details(self, playlists):
-        Spotify.get_spotify_headers(self)
         results = {
             playlist: Spotify._get_spotify_details(self, "playlists", playlist)
             for playlist in playlists
@@ -113,7 +160,6 @@ class Spotify(ServiceClient):
         ]
 
     def get_albums_details(self, albums):
-        Spotify.get_spotify_headers(self)
         results = {
             album: Spotify._get_spotify_details(self, "albums", album)
             for album in albums
@@ -129,7 +175,6 @@ class Spotify(ServiceClient):
         ]
 
     def get_tracks_details(self, tracks):
-        Spotify.get_spotify_headers(self)
         results = {
             track: Spotify._get_spotify_details(self, "tracks", track)
             for track in tracks
@@ -145,7 +190,6 @@ class Spotify(ServiceClient):
         ]
 
     def get_playlist_tracks(self, playlist):
-        Spotify.get_spotify_headers(self)
         data = Spotify._get_spotify_details(self, "playlists", playlist)
         items = data["tracks"]["items"]
         tracks = [
@@ -163,10 +207,9 @@ class Spotify(ServiceClient):
         return search_and_get_best_match(tracks, self.ytmusic)
 
     def get_service_homepage(self):
-        self.get_spotify_headers()
         # endpoint = f"{Spotify.service_endpoint}/v1/views/desktop-home"  # broken?
         endpoint = f"{Spotify.service_endpoint}/v1/browse/featured-playlists"
-        data = self.session.get(endpoint).json()
+        data = Spotify._spotify_get(self, endpoint)
         playlists = list(find_in_obj(data, "type", "playlist"))
 
         self.uri_images.update(
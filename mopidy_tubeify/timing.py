@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from mopidy_tubeify import logger
+
+# stage timings and counters, for every browse since startup (see stats)
+# and for the browse being traced by the current thread (see trace)
+_lock = threading.Lock()
+_stages = defaultdict(lambda: [0, 0.0])
+_counters = Counter()
+
+_current = threading.local()
+
+
+class Trace:
+    """Stage timings and counters of a single browse."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.stages = defaultdict(lambda: [0, 0.0])
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage][0] += 1
+            self.stages[stage][1] += seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def summary(self):
+        # stages run concurrently (tracks are matched in parallel), so
+        # their times can add up to more than the total
+        with self._lock:
+            stages = ", ".join(
+                f"{stage} {seconds:.3f}s/{count}"
+                for stage, (count, seconds) in sorted(self.stages.items())
+            )
+            counters = ", ".join(
+                f"{name} {n}" for name, n in sorted(self.counters.items())
+            )
+        total = time.perf_counter() - self.start
+        return f"{total:.3f}s total; {stages}; {counters}"
+
+
+def current():
+    return getattr(_current, "trace", None)
+
+
+@contextmanager
+def activate(trace):
+    """Attribute this thread's stages and counts to `trace` (or none)."""
+    previous = current()
+    _current.trace = trace
+    try:
+        yield trace
+    finally:
+        _current.trace = previous
+
+
+@contextmanager
+def trace(name):
+    """
+    Trace the stages and counts of this thread (and of threads that
+    activate the trace) until exit, logging a breakdown at debug level.
+    """
+    with activate(Trace(name)) as active:
+        try:
+            yield active
+        finally:
+            logger.debug(f"{name}: {active.summary()}")
+
+
+def add(stage, seconds):
+    with _lock:
+        _stages[stage][0] += 1
+        _stages[stage][1] += seconds
+    active = current()
+    if active is not None:
+        active.add(stage, seconds)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as stage `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator timing every call of a function as stage `name`."""
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] += n
+    active = current()
+    if active is not None:
+        active.count(name, n)
+
+
+def stats():
+    """Totals since startup (or reset): per stage count and seconds."""
+    with _lock:
+        return {
+            "stages": {
+                stage: {"count": count, "seconds": seconds}
+                for stage, (count, seconds) in _stages.items()
+            },
+            "counters": dict(_counters),
+        }
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
@@ -1,6 +1,5 @@
 import tornado.web
-from mopidy_tubeify.spotify import Spotify
-from mopidy_tubeify.apple import Apple
+from mopidy_tubeify import metrics
 from mopidy_youtube.data import (
     extract_playlist_id as extract_youtube_playlist_id,
 )
@@ -12,6 +11,9 @@ class WebHandler(tornado.web.RequestHandler):
         self.config = config
 
     def get(self):
+        from mopidy_tubeify.apple import Apple
+        from mopidy_tubeify.spotify import Spotify
+
         url = self.get_argument("url", None)
         if url is not None:
             if Spotify.playlist_regex.match(url):
@@ -102,3 +104,13 @@ class WebHandler(tornado.web.RequestHandler):
 </div></body></html>
 """
             )
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def initialize(self, config, core):
+        self.core = core
+        self.config = config
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(metrics.render())
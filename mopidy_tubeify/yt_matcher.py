@@ -3,27 +3,89 @@
 # https://github.com/spotDL/spotify-downloader/blob/v3/spotdl/providers/provider_utils.py
 
 import re
-import string
-from concurrent.futures.thread import ThreadPoolExecutor
+import threading
+from collections import Counter
+from concurrent.futures import as_completed
+from contextlib import contextmanager
 
 # ! Just for static typing
 from typing import List, Optional
 
-from cachetools import TTLCache, cached
+import numpy as np
+from cachetools.keys import hashkey
 
 # from mopidy_youtube.apis import youtube_japi
 # from mopidy_youtube.timeformat import ISO8601_to_seconds
-from rapidfuzz import fuzz
-from unidecode import unidecode
-
-from mopidy_tubeify import logger
+from rapidfuzz import fuzz, process
+
+from mopidy_tubeify import logger, metrics, timing
+from mopidy_tubeify.matchcache import match_key, track_record
+from mopidy_tubeify.normalize import (
+    fold,
+    normalize,
+    strip_punctuation,
+    title_words,
+)
+from mopidy_tubeify.scheduler import MatcherScheduler
+from mopidy_tubeify.singleflight import SingleFlight
+from mopidy_tubeify.sizedcache import SizedTTLCache
 
 bracked_re = re.compile(r"[\(\[](?P<bracketed>.*?)[\)\]]")
 
-cache_max_len = 4000
+# threads rapidfuzz may use to score the results of a single search
+scoring_workers = 1
+
+cache_max_bytes = 8388608
 cache_ttl = 21600
 
-yt_matcher_cache = TTLCache(maxsize=cache_max_len, ttl=cache_ttl)
+# the backend sets max_bytes from the config
+yt_matcher_cache = SizedTTLCache(max_bytes=cache_max_bytes, ttl=cache_ttl)
+metrics.caches["matcher"] = yt_matcher_cache
+
+# persistent MatchCache, set up by the backend when it starts
+match_store = None
+
+# concurrent identical YouTube Music calls (and matches) are made once
+ytm_flights = SingleFlight()
+
+# shared by all matching; the backend replaces it with a configured one
+scheduler = MatcherScheduler()
+
+# see report_progress
+_progress = threading.local()
+
+# see matcher_stats
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def matcher_stats():
+    """
+    Counts of how tracks have been matched: `lookups` of the in-memory
+    cache and its `memory_hits`; then, of the misses, those answered by
+    the persistent match store (`store_hits`) or its isrc index
+    (`isrc_hits`), or skipped as recently unmatched (`negative_hits`)
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["memory_hits"] = stats.get("lookups", 0) - stats.get(
+        "memory_misses", 0
+    )
+    return stats
+
+
+def _ytm_call(kind, ytmusic, method, *args, **kwargs):
+    key = (id(ytmusic), method, args, tuple(sorted(kwargs.items())))
+    timing.count(f"ytm_{kind}")
+    with timing.stage("ytm"):
+        return ytm_flights.do(
+            kind, key, scheduler.call, getattr(ytmusic, method), *args, **kwargs
+        )
 
 
 # Custom Decorator function
@@ -39,33 +101,73 @@ def listToTuple(function):
     return wrapper
 
 
-def search_and_get_best_match(tracks, ytmusic):
+@contextmanager
+def report_progress(progress):
+    # while active, search_and_get_best_match calls made by this thread
+    # report each track to progress as soon as it has been matched:
+    # progress.start(number_of_tracks) returns a batch, and then
+    # progress.matched(batch, index, track) is called for each track
+    _progress.reporter = progress
+    try:
+        yield progress
+    finally:
+        _progress.reporter = None
+
+
+def iter_search_and_get_best_match(tracks, ytmusic):
+    """
+    Match tracks concurrently, yielding `(index, track)` for each of them
+    as soon as it has been matched, in the order the matches complete.
+    """
+
+    trace = timing.current()
+
     def search_and_get_best_match_wrapper(track):
-        yt_track = _do_search_and_match(**track, ytmusic=ytmusic)
-        if yt_track:
-            track.update(yt_track)
-        return track
+        with timing.activate(trace), timing.stage("match"):
+            yt_track = _do_search_and_match(**track, ytmusic=ytmusic)
+        # a matched track is its track record, shared with the caches;
+        # an unmatched one is left as it was scraped
+        return yt_track or track
 
-    results = []
+    futures = {
+        scheduler.submit(search_and_get_best_match_wrapper, track): index
+        for index, track in enumerate(tracks)
+    }
+    for future in as_completed(futures):
+        yield futures[future], future.result()
 
-    with ThreadPoolExecutor(4) as executor:
-        futures = executor.map(search_and_get_best_match_wrapper, tracks)
-        [results.append(value) for value in futures if value is not None]
 
-    return results
+def search_and_get_best_match(tracks, ytmusic):
+    tracks = list(tracks)
+    timing.count("tracks", len(tracks))
+    progress = getattr(_progress, "reporter", None)
+    if progress:
+        batch = progress.start(len(tracks))
+
+    results = [None] * len(tracks)
+
+    for index, track in iter_search_and_get_best_match(tracks, ytmusic):
+        results[index] = track
+        if progress:
+            progress.matched(batch, index, track)
+
+    logger.debug(f"youtube music calls issued/coalesced: {ytm_flights.stats()}")
+    return [value for value in results if value is not None]
 
 
 def search_and_get_best_albums(albums, ytmusic):
+    trace = timing.current()
+
     def search_and_get_best_album_wrapper(album):
-        yt_album = search_and_get_best_album(album, ytmusic=ytmusic)
+        with timing.activate(trace), timing.stage("match_album"):
+            yt_album = search_and_get_best_album(album, ytmusic=ytmusic)
         if yt_album:
             return yt_album
 
     results = []
 
-    with ThreadPoolExecutor() as executor:
-        futures = executor.map(search_and_get_best_album_wrapper, albums)
-        [results.append(value) for value in futures if value is not None]
+    futures = scheduler.map(search_and_get_best_album_wrapper, albums)
+    [results.append(value) for value in futures if value is not None]
 
     return results
 
@@ -77,22 +179,35 @@ def search_and_get_best_album(artists_albumtitle, ytmusic):
     def get_albums(query, types):
         return [
             album
-            for album in ytmusic.search(query, filter="albums", limit=10)
+            for album in _ytm_call(
+                "albums", ytmusic, "search", query, filter="albums", limit=10
+            )
             if album["type"] in types
         ]
 
     def check_album(album, album_info_results):
-        lower_album_name = album[1].lower()
-        album_name_words = lower_album_name.replace("-", " ").split(" ")
-
-        lower_album_artists = [artist.lower().strip() for artist in album[0]]
-
-        for album_result in album_info_results:
-            lower_result_name = album_result["title"].lower()
-            lower_result_artists = [
-                artist["name"].lower() for artist in album_result["artists"]
-            ]
+        album_name_words = normalize(title_words(album[1])).split(" ")
+
+        lower_album_artists = [normalize(artist).strip() for artist in album[0]]
+
+        # each result's normalized title and artists, worked out just once
+        normalized_results = [
+            (
+                album_result,
+                normalize(album_result["title"]),
+                [
+                    normalize(artist["name"])
+                    for artist in album_result["artists"]
+                ],
+            )
+            for album_result in album_info_results
+        ]
 
+        for (
+            album_result,
+            lower_result_name,
+            lower_result_artists,
+        ) in normalized_results:
             # ! check for common album name word
             for album_name_word in album_name_words:
                 if (
@@ -211,8 +326,30 @@ def _match_percentage(str1: str, str2: str, score_cutoff: float = 0) -> float:
         )
 
 
+def cache_matches(function):
+    # like cachetools' cached, but only matches are kept in
+    # yt_matcher_cache: whether to search for an unmatched track again is
+    # up to the match store's back-off
+    def wrapper(*args, **kwargs):
+        _count("lookups")
+        key = hashkey(*args, **kwargs)
+        try:
+            return yt_matcher_cache[key]
+        except KeyError:
+            pass
+        result = function(*args, **kwargs)
+        if result is not None:
+            try:
+                yt_matcher_cache[key] = result
+            except ValueError:
+                pass  # too large to keep
+        return result
+
+    return wrapper
+
+
 @listToTuple
-@cached(cache=yt_matcher_cache)
+@cache_matches
 def _do_search_and_match(
     song_name: str,
     song_artists: List[str],
@@ -220,7 +357,63 @@ def _do_search_and_match(
     ytmusic,
     song_duration: int = 0,
     videoId: str = None,
-) -> Optional[str]:
+) -> Optional[dict]:
+    # consult the persistent match store before going anywhere near
+    # YouTube Music; the same recording turns up in lots of playlists,
+    # so the isrc index answers for tracks not seen in this form before.
+    # tracks that recently failed to match are skipped
+    _count("memory_misses")
+    key = None
+    if match_store is not None:
+        key = match_key(song_name, song_artists, isrc, song_duration, videoId)
+        stored_result = match_store.get(key)
+        if stored_result is not None:
+            _count("store_hits")
+            return stored_result
+        if isrc and not videoId:
+            stored_result = match_store.get_isrc(isrc)
+            if stored_result is not None:
+                _count("isrc_hits")
+                return stored_result
+        if match_store.is_miss(key):
+            _count("negative_hits")
+            logger.debug(f"skipping recently unmatched {song_name}")
+            return None
+
+    # the cache has no lock, so other threads may be matching this same
+    # track right now; if so, wait for their result
+    result = ytm_flights.do(
+        "match",
+        (id(ytmusic), song_name, song_artists, isrc, song_duration, videoId),
+        _search_and_match,
+        song_name,
+        song_artists,
+        isrc,
+        ytmusic,
+        song_duration,
+        videoId,
+    )
+
+    result = track_record(result)
+    if key is not None:
+        if result:
+            match_store.set(key, result)
+            if isrc:
+                match_store.set_isrc(isrc, result)
+        else:
+            match_store.set_miss(key)
+
+    return result
+
+
+def _search_and_match(
+    song_name: str,
+    song_artists: List[str],
+    isrc: str,
+    ytmusic,
+    song_duration: int = 0,
+    video_id: str = None,
+) -> Optional[dict]:
     """
     `str` `song_name` : name of song
     `list<str>` `song_artists` : list containing name of contributing artists
@@ -230,10 +423,14 @@ def _do_search_and_match(
     RETURNS `str` : videoId of the best match
     """
 
-    if videoId:
+    if video_id:
         sorted_videoId_results = []
         try:
-            videoId_results = [ytmusic.get_song(videoId)["videoDetails"]]
+            videoId_results = [
+                _ytm_call("get_song", ytmusic, "get_song", video_id)[
+                    "videoDetails"
+                ]
+            ]
 
             # .get_song["videoDetails"] is slightly different to .search
             videoId_results[0]["artists"] = [
@@ -251,13 +448,13 @@ def _do_search_and_match(
 
         except Exception as e:
             logger.warn(
-                f"_do_search_and_match error {e} with videoId {videoId} ({song_name})"
+                f"_do_search_and_match error {e} with videoId {video_id} ({song_name})"
             )
 
         if sorted_videoId_results:
             return sorted_videoId_results[0]["result"]
         else:
-            logger.warn(f"No suitable result for videoId {videoId}")
+            logger.warn(f"No suitable result for videoId {video_id}")
             logger.warn(
                 f"search for {song_name}, {song_artists}, {song_duration}"
             )
@@ -268,7 +465,7 @@ def _do_search_and_match(
     if isrc is not None:
         sorted_isrc_results = []
         try:
-            isrc_results = ytmusic.search(f'"{isrc}"')
+            isrc_results = _ytm_call("isrc", ytmusic, "search", f'"{isrc}"')
 
             # make sure the isrc result is relevant
             sorted_isrc_results = _order_yt_results(
@@ -290,7 +487,9 @@ def _do_search_and_match(
     # Query YTM by songs only first, this way if we get correct result on the first try
     # we don't have to make another request to ytmusic api that could result in us
     # getting rate limited sooner
-    song_info_results = ytmusic.search(song_title, filter="songs")
+    song_info_results = _ytm_call(
+        "songs", ytmusic, "search", song_title, filter="songs"
+    )
 
     # Order results
     ordered_song_info_results = _order_yt_results(
@@ -318,7 +517,9 @@ def _do_search_and_match(
             logger.warn(
                 f"Couldn't find the song on YouTube Music: {song_title}, trying videos"
             )
-            song_info_results = ytmusic.search(song_title, filter="videos")
+            song_info_results = _ytm_call(
+                "videos", ytmusic, "search", song_title, filter="videos"
+            )
 
             if song_info_results is None:
                 logger.warn(
@@ -390,6 +591,7 @@ def _do_search_and_match(
         return sorted_song_info_results[0]["result"]
 
 
+@timing.timed("score")
 def _order_yt_results(
     results: List[dict],
     song_name: str,
@@ -401,24 +603,69 @@ def _order_yt_results(
 
     videoIds_with_match_value = []
 
-    for result in results:
-        # ! skip results without videoId, this happens if you are country restricted or
-        # ! video is unavailabe
-        if result["videoId"] is None:
-            continue
+    # ! skip results without videoId, this happens if you are country restricted or
+    # ! video is unavailabe
+    # each candidate carries its normalized title, title words and artists
+    candidates = [
+        (
+            result,
+            fold(result["title"]),
+            title_words(result["title"]),
+            [
+                normalize(result_artist["name"])
+                for result_artist in result.get("artists") or []
+            ],
+        )
+        for result in results
+        if result["videoId"] is not None
+    ]
+    if not candidates:
+        return videoIds_with_match_value
+
+    # score in bulk: every result title against the song title and the
+    # song name, and every result artist against every song artist
+    title_scores = process.cdist(
+        [fold(song_title), fold(song_name)],
+        [title for _, title, _, _ in candidates],
+        scorer=fuzz.partial_ratio,
+        processor=None,
+        score_cutoff=60,
+        dtype=np.float64,
+        workers=scoring_workers,
+    )
+
+    sentence_words = [
+        word for word in strip_punctuation(song_name).split(" ") if word
+    ]
+
+    # ! we use fuzzy matching because YouTube spellings might be
+    # ! mucked up i.e if video
+    lower_song_artists = [normalize(artist) for artist in song_artists]
+    lower_result_artists = []
+    result_artist_spans = []
+    for _, _, _, artists in candidates:
+        start = len(lower_result_artists)
+        lower_result_artists.extend(artists)
+        result_artist_spans.append((start, len(lower_result_artists)))
+
+    artist_scores = None
+    if lower_song_artists and lower_result_artists:
+        artist_scores = process.cdist(
+            lower_song_artists,
+            lower_result_artists,
+            scorer=fuzz.partial_ratio,
+            processor=None,
+            score_cutoff=85,
+            dtype=np.float64,
+            workers=scoring_workers,
+        )
 
+    for index, (result, _, lower_result_name, _) in enumerate(candidates):
         if (
             result.get("category") == "Videos"
             and result.get("resultType") == "video"
         ):
-            name_match = round(
-                _match_percentage(
-                    str(unidecode(song_title)),
-                    str(unidecode(result["title"].lower())),
-                    60,
-                ),
-                ndigits=3,
-            )
+            name_match = round(float(title_scores[0, index]), ndigits=3)
 
             if name_match:
                 videoIds_with_match_value.append(
@@ -426,63 +673,23 @@ def _order_yt_results(
                 )
 
         else:
-            lower_song_name = song_name.translate(
-                str.maketrans("", "", string.punctuation)
-            ).lower()
-            lower_result_name = (
-                result["title"]
-                .replace("-", " ")
-                .translate(str.maketrans("", "", string.punctuation))
-                .lower()
-            )
-
-            sentence_words = lower_song_name.split(" ")
-
-            common_word = False
-
-            # ! check for common word
-            for word in sentence_words:
-                if word != "" and word in lower_result_name:
-                    common_word = True
-
             # ! if there are no common words, skip result
-            if common_word is False:
+            if not any(word in lower_result_name for word in sentence_words):
                 continue
 
             # Find artist match
             # ! match  =
             #               (no of artist names in result) /
             #               (no. of artist names on spotify) * 100
-            artist_match_number = 0
-
-            # ! we use fuzzy matching because YouTube spellings might be
-            # ! mucked up i.e if video
-            for artist in song_artists:
-                # ! something like _match_percentage('rionos', 'aiobahn,
-                # ! rionos Motivation(remix)' would return 100, so we're
-                # ! absolutely corrent in matching artists to song name.
-                if result.get("artists"):
-                    for result_artist in result["artists"]:
-                        if _match_percentage(
-                            str(
-                                unidecode(
-                                    artist.translate(
-                                        str.maketrans(
-                                            "", "", string.punctuation
-                                        )
-                                    ).lower()
-                                )
-                            ),
-                            str(
-                                unidecode(result_artist["name"])
-                                .translate(
-                                    str.maketrans("", "", string.punctuation)
-                                )
-                                .lower()
-                            ),
-                            85,
-                        ):
-                            artist_match_number += 1
+            # ! something like _match_percentage('rionos', 'aiobahn,
+            # ! rionos Motivation(remix)' would return 100, so we're
+            # ! absolutely corrent in matching artists to song name.
+            start, end = result_artist_spans[index]
+            artist_match_number = (
+                int(np.count_nonzero(artist_scores[:, start:end]))
+                if artist_scores is not None
+                else 0
+            )
 
             # ! Skip if there are no artists in common, (else, results like
             # ! 'Griffith Swank - Madness' will be the top match for
@@ -492,22 +699,10 @@ def _order_yt_results(
 
             artist_match = (artist_match_number / len(song_artists)) * 100
 
+            # case where artist is included in title, or where artist is
+            # author and video title is only the track name
             name_match = round(
-                max(
-                    # case where artist is included in title
-                    _match_percentage(
-                        str(unidecode(song_title)),
-                        str(unidecode(result["title"].lower())),
-                        60,
-                    ),
-                    # case where artist is author and video title is only
-                    # the track name
-                    _match_percentage(
-                        str(unidecode(song_name.lower())),
-                        str(unidecode(result["title"].lower())),
-                        60,
-                    ),
-                ),
+                float(max(title_scores[0, index], title_scores[1, index])),
                 ndigits=3,
             )
 
@@ -0,0 +1,280 @@
+"""
+Offline benchmark of matching against YouTube Music.
+
+Replays recorded `ytmusic.search` and `ytmusic.get_song` responses from a
+fixture file through `search_and_get_best_match` and
+`search_and_get_best_albums`, and reports wall time, CPU time, YouTube
+Music calls issued, cache hits and match precision/recall against the
+labels in the fixture. Run with `python -m tests.benchmarks.matching`.
+
+A fixture holds the labelled tracks and albums (`expected` is the videoId
+or browseId that should be matched, or null when nothing should be), and
+the responses to replay. Queries with no recorded response get an empty
+result. `--record` re-records the responses from the live YouTube Music.
+"""
+
+import argparse
+import copy
+import json
+import pathlib
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from mopidy_tubeify import yt_matcher
+from mopidy_tubeify.data import flatten
+from mopidy_tubeify.matchcache import MatchCache
+from mopidy_tubeify.singleflight import SingleFlight
+
+fixtures_dir = pathlib.Path(__file__).parent / "fixtures"
+
+
+def load_fixtures(path=fixtures_dir / "matching.json"):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ReplayYTMusic:
+    """Stands in for YTMusic, answering from recorded responses."""
+
+    def __init__(self, fixtures, latency=0.0):
+        self.search_responses = {
+            (item["query"], item["filter"]): item["response"]
+            for item in fixtures["search"]
+        }
+        self.get_song_responses = fixtures["get_song"]
+        self.latency = latency
+        self.calls = Counter()
+        self.unrecorded = []
+        self._lock = threading.Lock()
+
+    def _call(self, kind, key, responses, default):
+        with self._lock:
+            self.calls[kind] += 1
+            if key not in responses:
+                self.unrecorded.append(key)
+        if self.latency:
+            time.sleep(self.latency)
+        return copy.deepcopy(responses.get(key, default))
+
+    def search(self, query, filter=None, scope=None, limit=20, **kwargs):
+        return self._call(
+            f"search:{filter}", (query, filter), self.search_responses, []
+        )
+
+    def get_song(self, video_id, signature_timestamp=None):
+        return self._call(
+            "get_song", video_id, self.get_song_responses, {"videoDetails": {}}
+        )
+
+
+class RecordingYTMusic:
+    """Wraps a live YTMusic, recording its responses as a fixture."""
+
+    def __init__(self, ytmusic):
+        self.ytmusic = ytmusic
+        self.search_responses = []
+        self.get_song_responses = {}
+
+    def search(self, query, filter=None, scope=None, limit=20, **kwargs):
+        response = self.ytmusic.search(query, filter=filter, limit=limit)
+        self.search_responses.append(
+            {"query": query, "filter": filter, "response": response}
+        )
+        return response
+
+    def get_song(self, video_id, signature_timestamp=None):
+        response = self.ytmusic.get_song(video_id)
+        self.get_song_responses[video_id] = {
+            "videoDetails": response["videoDetails"]
+        }
+        return response
+
+
+def _reset_matcher():
+    yt_matcher.yt_matcher_cache.clear()
+    yt_matcher.ytm_flights = SingleFlight()
+
+
+def _score(labels, predictions):
+    true_positives = sum(
+        1
+        for expected, predicted in zip(labels, predictions)
+        if predicted and predicted == expected
+    )
+    predicted_positives = sum(1 for predicted in predictions if predicted)
+    labelled_positives = sum(1 for expected in labels if expected)
+    return {
+        "precision": (
+            true_positives / predicted_positives if predicted_positives else 1.0
+        ),
+        "recall": (
+            true_positives / labelled_positives if labelled_positives else 1.0
+        ),
+        "correct": sum(
+            1
+            for expected, predicted in zip(labels, predictions)
+            if (predicted or None) == expected
+        ),
+        "total": len(labels),
+        "wrong": [
+            (expected, predicted)
+            for expected, predicted in zip(labels, predictions)
+            if (predicted or None) != expected
+        ],
+    }
+
+
+def run(fixtures, ytmusic=None, warm=False, store=None):
+    """
+    Match the fixture's tracks and albums once, and return a report. With
+    `warm`, the matcher's in-memory caches are kept from the previous run;
+    `store` is a MatchCache to use as the persistent match store.
+    """
+    ytmusic = ytmusic or ReplayYTMusic(fixtures)
+    if not warm:
+        _reset_matcher()
+    yt_matcher.match_store = store
+
+    tracks = [dict(item["track"]) for item in fixtures["tracks"]]
+    albums = [
+        (tuple(item["album"][0]), item["album"][1])
+        for item in fixtures["albums"]
+    ]
+
+    stats_before = yt_matcher.matcher_stats()
+    calls_before = sum(getattr(ytmusic, "calls", Counter()).values())
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+    try:
+        matched_tracks = yt_matcher.search_and_get_best_match(tracks, ytmusic)
+        matched_albums = [
+            list(flatten(yt_matcher.search_and_get_best_album(album, ytmusic)))
+            for album in albums
+        ]
+    finally:
+        yt_matcher.match_store = None
+
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+    stats_after = yt_matcher.matcher_stats()
+    stats = {
+        name: stats_after.get(name, 0) - stats_before.get(name, 0)
+        for name in stats_after
+    }
+
+    return {
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        "ytm_calls": sum(getattr(ytmusic, "calls", Counter()).values())
+        - calls_before,
+        "cache_hits": sum(
+            stats.get(name, 0)
+            for name in (
+                "memory_hits",
+                "store_hits",
+                "isrc_hits",
+                "negative_hits",
+            )
+        ),
+        "matcher_stats": stats,
+        "unrecorded": list(getattr(ytmusic, "unrecorded", [])),
+        "tracks": _score(
+            [item["expected"] for item in fixtures["tracks"]],
+            [track.get("videoId") for track in matched_tracks],
+        ),
+        "albums": _score(
+            [item["expected"] for item in fixtures["albums"]],
+            [
+                album[0]["browseId"] if album else None
+                for album in matched_albums
+            ],
+        ),
+    }
+
+
+def format_report(name, report):
+    lines = [
+        f"{name}:",
+        f"  wall time  {report['wall_time'] * 1000:8.1f} ms",
+        f"  cpu time   {report['cpu_time'] * 1000:8.1f} ms",
+        f"  ytm calls  {report['ytm_calls']:8d}",
+        f"  cache hits {report['cache_hits']:8d}",
+    ]
+    for kind in ("tracks", "albums"):
+        score = report[kind]
+        lines.append(
+            f"  {kind:<7} {score['correct']}/{score['total']} correct, "
+            f"precision {score['precision']:.2f}, "
+            f"recall {score['recall']:.2f}"
+        )
+        for expected, predicted in score["wrong"]:
+            lines.append(f"    expected {expected}, got {predicted}")
+    if report["unrecorded"]:
+        lines.append(f"  unrecorded queries: {report['unrecorded']}")
+    return "\n".join(lines)
+
+
+def record(fixtures, path):
+    from ytmusicapi import YTMusic
+
+    recorder = RecordingYTMusic(YTMusic())
+    run(fixtures, recorder)
+    fixtures = dict(
+        fixtures,
+        search=recorder.search_responses,
+        get_song=recorder.get_song_responses,
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, indent=1, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--fixtures", type=pathlib.Path, default=fixtures_dir / "matching.json"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="simulated YouTube Music latency, in seconds",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="re-record the fixture's responses from YouTube Music",
+    )
+    parser.add_argument(
+        "--match-cache",
+        action="store_true",
+        help="also match through a persistent match store, as after a restart",
+    )
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if args.record:
+        record(fixtures, args.fixtures)
+        return
+
+    ytmusic = ReplayYTMusic(fixtures, latency=args.latency)
+    if not args.match_cache:
+        print(format_report("cold", run(fixtures, ytmusic)))
+        print(format_report("warm", run(fixtures, ytmusic, warm=True)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = MatchCache(pathlib.Path(directory) / "matches.sqlite3")
+        print(format_report("cold", run(fixtures, ytmusic, store=store)))
+        print(
+            format_report(
+                "warm", run(fixtures, ytmusic, warm=True, store=store)
+            )
+        )
+        print(format_report("restart", run(fixtures, ytmusic, store=store)))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark of ServiceClient._get_items_soup with each HTML parser.
+
+For every page type in every service's service_schema, times
+`_get_items_soup` on a page with each parser that is installed, and
+reports its peak memory, the items found and how often the html5lib
+fallback was needed. html.parser is run with and without the schema's
+SoupStrainer ("html.parser/all" parses the whole page).
+Run with `python -m tests.benchmarks.parsing`.
+
+Pages saved as `<pages>/<service_uri>/<items_type>.html` are used where
+they exist; for the others, a page is made from the schema: the
+container and its items, among plenty of unrelated markup.
+"""
+
+import argparse
+import html
+import importlib
+import importlib.util
+import inspect
+import pathlib
+import pkgutil
+import re
+import time
+import tracemalloc
+
+from requests.models import Response
+
+import mopidy_tubeify
+from mopidy_tubeify import serviceclient, timing
+from mopidy_tubeify.serviceclient import ServiceClient
+
+pages_dir = pathlib.Path(__file__).parent / "fixtures" / "pages"
+
+parsers = ["html5lib", "html.parser/all", "html.parser", "lxml/all", "lxml"]
+
+void_elements = {"input", "meta", "link", "img", "br"}
+
+
+def service_classes():
+    classes = {}
+    for module in pkgutil.iter_modules(mopidy_tubeify.__path__):
+        try:
+            module = importlib.import_module(f"mopidy_tubeify.{module.name}")
+        except Exception:
+            continue
+        for _, service in inspect.getmembers(module, inspect.isclass):
+            if (
+                issubclass(service, ServiceClient)
+                and service.service_schema
+                and service.__module__ == module.__name__
+            ):
+                classes[service.service_uri] = service
+    return classes
+
+
+def _example(pattern):
+    """Some text that the regex `pattern` matches, for the schemas here."""
+    # the first of any alternatives, without the group
+    pattern = re.sub(r"\((?:\?P<\w+>)?([^|()]*)(?:\|[^()]*)?\)", r"\1", pattern)
+    text = []
+    for token in re.finditer(r"\\(.)|\.\{(\d+)\}|\.[*+]|([\^$?])|(.)", pattern):
+        escaped, count, anchor, char = token.groups()
+        if escaped:
+            text.append(escaped)
+        elif count:
+            text.append("x" * int(count))
+        elif char:
+            text.append(char)
+        elif not anchor:
+            text.append("x")
+    return "".join(text)
+
+
+def _text(value):
+    if isinstance(value, re.Pattern):
+        return _example(value.pattern)
+    return value
+
+
+def _attrs(attrs):
+    return "".join(
+        f' {name}="{html.escape(_text(value))}"'
+        for name, value in (attrs or {}).items()
+    )
+
+
+def _element(spec, contents):
+    name = spec["name"]
+    attrs = _attrs(spec.get("attrs"))
+    if "string" in spec:
+        contents = html.escape(_text(spec["string"]), quote=False)
+    if name == "table":
+        contents = f"<tbody><tr><td>{contents}</td></tr></tbody>"
+    if name in void_elements:
+        return f'<{name}{attrs} value="1">'
+    return f"<{name}{attrs}>{contents}</{name}>"
+
+
+def make_page(schema, items=50, filler=300):
+    """A page with what `schema` looks for, among `filler` other blocks."""
+    noise = "".join(
+        f'<div class="card"><span>card {n}</span>'
+        f'<a href="/card/{n}">more &amp; more</a>'
+        f"<p>some <b>text</b> for card {n}</p></div>"
+        for n in range(filler)
+    )
+    contents = "the container"
+    if "item" in schema:
+        contents = "".join(
+            _element(schema["item"], f"item {n}") for n in range(items)
+        )
+        if schema["item"]["name"] == "li":
+            contents = f"<ul>{contents}</ul>"
+    if "container" in schema:
+        contents = _element(schema["container"], contents)
+    return (
+        "<!DOCTYPE html><html><head><title>page</title></head><body>"
+        f"{noise}<main>{contents}</main>{noise}</body></html>"
+    )
+
+
+def page_content(service_uri, items_type, schema):
+    saved = pages_dir / service_uri / f"{items_type}.html"
+    if saved.exists():
+        return saved.read_bytes()
+    return make_page(schema).encode("utf-8")
+
+
+def get_items(service, content, items_type, parser):
+    response = Response()
+    response._content = content
+    client = service.__new__(service)
+    parser, _, whole = parser.partition("/")
+    if whole:
+        serviceclient._strainers[(service, items_type)] = None
+    default, ServiceClient.html_parser = ServiceClient.html_parser, parser
+    try:
+        return client._get_items_soup(response, items_type)
+    finally:
+        ServiceClient.html_parser = default
+        serviceclient._strainers.pop((service, items_type), None)
+
+
+def installed_parsers():
+    return [
+        parser
+        for parser in parsers
+        if parser.startswith("html.parser") or importlib.util.find_spec(parser)
+    ]
+
+
+def run(repeat=3):
+    results = []
+    available = installed_parsers()
+    for service_uri, service in sorted(service_classes().items()):
+        for items_type, schema in service.service_schema.items():
+            content = page_content(service_uri, items_type, schema)
+            for parser in available:
+                fallbacks = timing.stats()["counters"].get(
+                    "parser_fallbacks", 0
+                )
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    items = get_items(service, content, items_type, parser)
+                seconds = (time.perf_counter() - start) / repeat
+                tracemalloc.start()
+                get_items(service, content, items_type, parser)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results.append(
+                    {
+                        "service": service_uri,
+                        "items_type": items_type,
+                        "parser": parser,
+                        "seconds": seconds,
+                        "peak": peak,
+                        "items": len(items) if "item" in schema else 1,
+                        "fallbacks": (
+                            timing.stats()["counters"].get(
+                                "parser_fallbacks", 0
+                            )
+                            - fallbacks
+                        )
+                        // repeat,
+                    }
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    totals = {}
+    print(
+        f"{'page':<36}{'parser':<17}{'ms':>8}{'peak KiB':>10}"
+        f"{'items':>7}{'fallback':>10}"
+    )
+    for result in results:
+        page = f"{result['service']}:{result['items_type']}"
+        print(
+            f"{page:<36}{result['parser']:<17}"
+            f"{result['seconds'] * 1000:8.1f}{result['peak'] / 1024:10.0f}"
+            f"{result['items']:7d}"
+            f"{result['fallbacks']:10d}"
+        )
+        totals[result["parser"]] = (
+            totals.get(result["parser"], 0) + result["seconds"]
+        )
+    for parser, seconds in totals.items():
+        print(f"total {parser:<17}{seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Offline benchmark of the size of preload data.
+
+Builds the track refs for lists of matched tracks made from the recorded
+YouTube Music results in the matching fixture, and reports the length of
+the first track's uri and of the JSON-RPC response that carries the refs
+to a client, with every ytmusic field in the preload data (as it used to
+be) and with just the fields mopidy-youtube reads. Run with
+`python -m tests.benchmarks.preload`.
+"""
+
+import argparse
+import itertools
+import json
+
+from mopidy.models import ModelJSONEncoder, Ref
+
+from mopidy_tubeify.preload import preload_uri
+
+from tests.benchmarks.matching import load_fixtures
+
+
+def matched_tracks(count, fixtures=None):
+    # scraped tracks, updated with their match, as yt_matcher leaves them
+    fixtures = fixtures or load_fixtures()
+    results = [
+        result
+        for item in fixtures["search"]
+        for result in item["response"]
+        if result.get("videoId") and result.get("title")
+    ]
+    return [
+        dict(
+            result,
+            song_name=result["title"],
+            song_artists=[artist["name"] for artist in result["artists"]],
+            song_duration=result.get("duration_seconds", 0),
+            isrc=None,
+        )
+        for result in itertools.islice(itertools.cycle(results), count)
+    ]
+
+
+def full_uri(video_id, tracks):
+    data = json.dumps(tracks)
+    return f"yt:video:{video_id}:preload:{data.encode('utf-8').hex()}"
+
+
+def browse_response(tracks, encode):
+    refs = [
+        Ref.track(uri=f"yt:video:{track['videoId']}", name=track["title"])
+        for track in tracks
+    ]
+    refs[0] = Ref.track(
+        uri=encode(tracks[0]["videoId"], tracks), name=tracks[0]["title"]
+    )
+    return refs, json.dumps(
+        {"jsonrpc": "2.0", "id": 1, "result": refs}, cls=ModelJSONEncoder
+    )
+
+
+def run(counts=(50, 500)):
+    rows = []
+    for count in counts:
+        tracks = matched_tracks(count)
+        for name, encode in (("full", full_uri), ("compact", preload_uri)):
+            refs, response = browse_response(tracks, encode)
+            rows.append((count, name, len(refs[0].uri), len(response)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--tracks", type=int, nargs="+", default=[50, 500], metavar="N"
+    )
+    args = parser.parse_args()
+
+    print(f"{'tracks':>6} {'preload':<8} {'uri bytes':>10} {'response':>10}")
+    for count, name, uri_size, response_size in run(args.tracks):
+        print(f"{count:>6} {name:<8} {uri_size:>10} {response_size:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Micro-benchmark of yt_matcher._order_yt_results, the scoring of YouTube
+Music search results against a track.
+
+Compares the current implementation with the original per-pair scoring
+(kept here as `reference_order_yt_results`) on a deterministic synthetic
+corpus. Run with `python -m tests.benchmarks.scoring`.
+"""
+
+import random
+import string
+import time
+
+from unidecode import unidecode
+
+from mopidy_tubeify import yt_matcher
+
+words = (
+    "love night song the blue heart fire déjà vu road (live) [remastered] "
+    "dance girl rain café don't stop Motörhead rock'n'roll 🎸 city lights"
+).split()
+
+
+def reference_order_yt_results(
+    results, song_name, song_artists, song_title, song_duration
+):
+    # _order_yt_results as it was, scoring one pair of strings at a time
+    results_with_match_value = []
+    for result in results:
+        if result["videoId"] is None:
+            continue
+        if (
+            result.get("category") == "Videos"
+            and result.get("resultType") == "video"
+        ):
+            name_match = round(
+                yt_matcher._match_percentage(
+                    str(unidecode(song_title)),
+                    str(unidecode(result["title"].lower())),
+                    60,
+                ),
+                ndigits=3,
+            )
+            if name_match:
+                results_with_match_value.append(
+                    {"average_match": name_match, "result": result}
+                )
+        else:
+            lower_song_name = song_name.translate(
+                str.maketrans("", "", string.punctuation)
+            ).lower()
+            lower_result_name = (
+                result["title"]
+                .replace("-", " ")
+                .translate(str.maketrans("", "", string.punctuation))
+                .lower()
+            )
+            common_word = False
+            for word in lower_song_name.split(" "):
+                if word != "" and word in lower_result_name:
+                    common_word = True
+            if common_word is False:
+                continue
+            artist_match_number = 0
+            for artist in song_artists:
+                if result.get("artists"):
+                    for result_artist in result["artists"]:
+                        if yt_matcher._match_percentage(
+                            str(
+                                unidecode(
+                                    artist.translate(
+                                        str.maketrans(
+                                            "", "", string.punctuation
+                                        )
+                                    ).lower()
+                                )
+                            ),
+                            str(
+                                unidecode(result_artist["name"])
+                                .translate(
+                                    str.maketrans("", "", string.punctuation)
+                                )
+                                .lower()
+                            ),
+                            85,
+                        ):
+                            artist_match_number += 1
+            if artist_match_number == 0:
+                continue
+            artist_match = (artist_match_number / len(song_artists)) * 100
+            name_match = round(
+                max(
+                    yt_matcher._match_percentage(
+                        str(unidecode(song_title)),
+                        str(unidecode(result["title"].lower())),
+                        60,
+                    ),
+                    yt_matcher._match_percentage(
+                        str(unidecode(song_name.lower())),
+                        str(unidecode(result["title"].lower())),
+                        60,
+                    ),
+                ),
+                ndigits=3,
+            )
+            if name_match == 0:
+                continue
+            if (
+                song_duration
+                and song_duration > 0
+                and "duration_seconds" in result
+            ):
+                delta = result["duration_seconds"] - song_duration
+                time_match = 100 - (delta**2) / song_duration * 100
+                average_match = (artist_match + name_match + time_match) / 3
+            else:
+                average_match = (artist_match + name_match) / 2
+            results_with_match_value.append(
+                {"average_match": average_match, "result": result}
+            )
+    return results_with_match_value
+
+
+def _phrase(rng, length):
+    return " ".join(rng.choice(words) for _ in range(length))
+
+
+def corpus(tracks=200, results_per_track=20, seed=1):
+    """Yield (results, song_name, song_artists, song_title, song_duration)."""
+    rng = random.Random(seed)
+    for _ in range(tracks):
+        song_name = _phrase(rng, rng.randint(1, 4))
+        song_artists = [
+            _phrase(rng, rng.randint(1, 2)).title()
+            for _ in range(rng.randint(1, 3))
+        ]
+        song_duration = rng.choice([0, rng.randint(120, 400)])
+        results = []
+        for n in range(results_per_track):
+            video = rng.random() < 0.2
+            results.append(
+                {
+                    "videoId": None if rng.random() < 0.05 else f"v{n:010d}",
+                    "title": (
+                        song_name
+                        if rng.random() < 0.3
+                        else _phrase(rng, rng.randint(1, 5))
+                    ),
+                    "artists": [
+                        {
+                            "name": (
+                                rng.choice(song_artists)
+                                if rng.random() < 0.4
+                                else _phrase(rng, 2).title()
+                            )
+                        }
+                        for _ in range(rng.randint(0, 2))
+                    ],
+                    "duration_seconds": rng.randint(100, 420),
+                    "category": "Videos" if video else "Songs",
+                    "resultType": "video" if video else "song",
+                }
+            )
+        song_title = f"{', '.join(song_artists)} - {song_name}".lower()
+        yield results, song_name, song_artists, song_title, song_duration
+
+
+def ranking(scored):
+    return [
+        (round(item["average_match"], 9), item["result"]["videoId"])
+        for item in sorted(
+            scored, key=lambda x: x["average_match"], reverse=True
+        )
+    ]
+
+
+def time_per_track(order_yt_results, cases, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for case in cases:
+            order_yt_results(*case)
+        elapsed = (time.perf_counter() - start) / len(cases)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    cases = list(corpus())
+    before = time_per_track(reference_order_yt_results, cases)
+    print(f"per-track scoring, before: {before * 1e6:8.1f} µs")
+    for workers in (1, -1):
+        yt_matcher.scoring_workers = workers
+        after = time_per_track(yt_matcher._order_yt_results, cases)
+        print(
+            f"per-track scoring, after (workers={workers:2}): "
+            f"{after * 1e6:8.1f} µs ({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
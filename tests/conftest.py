@@ -0,0 +1,48 @@
+import pytest
+
+
+class Response:
+    def __init__(self, status_code=200, text="", data=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode()
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class TokenSession:
+    # stands in for a service that scrapes a token from its web player
+    # and sends it to its API. token_page(session, url) is the text of
+    # the player's page at url (None for the API), and makes a new token,
+    # valid for `lifetime` seconds, if it has one; the API answers with
+    # api_data(url), or 401 for a revoked token
+    def __init__(self, token_page, api_data, lifetime):
+        self.token_page = token_page
+        self.api_data = api_data
+        self.lifetime = lifetime
+        self.headers = {}
+        self.sent_headers = None
+        self.tokens = []
+        self.revoked = set()
+
+    def client(self, service):
+        client = service(None, {}, None)
+        client.session = self
+        return client
+
+    def get(self, url, headers=None):
+        self.sent_headers = headers
+        text = self.token_page(self, url)
+        if text is not None:
+            return Response(text=text)
+        token = headers["authorization"][len("Bearer ") :]
+        if token in self.revoked:
+            return Response(401)
+        return Response(data=self.api_data(url))
+
+
+@pytest.fixture
+def token_session():
+    return TokenSession
@@ -0,0 +1,79 @@
+import base64
+import json
+import time
+
+import pytest
+
+from mopidy_tubeify import apple
+from mopidy_tubeify.apple import Apple
+from mopidy_tubeify.serviceclient import ServiceClient
+
+
+def jwt(n, exp):
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=")
+
+    token = b".".join(
+        [encode({"alg": "ES256", "n": n}), encode({"exp": int(exp)}), b""]
+    ).decode()
+    # the web player's token is 268 characters long
+    return token + "s" * (268 - len(token))
+
+
+def token_page(session, url):
+    # music.apple.com, whose script has a new token each time it is
+    # fetched
+    if url.endswith("/browse"):
+        return '<script type="module" src="assets/index.js"></script>'
+    if url.endswith("/assets/index.js"):
+        session.tokens.append(
+            jwt(len(session.tokens) + 1, time.time() + session.lifetime)
+        )
+        return f'x;const ab="{session.tokens[-1]}";y'
+    return None
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path, token_session):
+    monkeypatch.setattr(apple, "_tokens", {})
+    monkeypatch.setattr(ServiceClient, "cache_dir", tmp_path)
+    return token_session(token_page, lambda url: {"data": []}, lifetime=86400)
+
+
+def get_user_playlists(session):
+    return session.client(Apple).get_user_playlists("apple-music/1234567890")
+
+
+def test_jwt_expiry():
+    assert apple.jwt_expiry(jwt(1, 1700000000)) == 1700000000
+
+
+def test_token_is_kept_until_it_expires(session, monkeypatch):
+    get_user_playlists(session)
+    get_user_playlists(session)
+    assert len(session.tokens) == 1
+
+    # and across restarts
+    monkeypatch.setattr(apple, "_tokens", {})
+    get_user_playlists(session)
+    assert len(session.tokens) == 1
+    assert (
+        session.sent_headers["authorization"] == f"Bearer {session.tokens[0]}"
+    )
+
+
+def test_token_is_refreshed_before_it_expires(session):
+    session.lifetime = Apple.token_margin / 2
+    get_user_playlists(session)
+    get_user_playlists(session)
+    assert len(session.tokens) == 2
+
+
+def test_token_is_refreshed_when_refused(session):
+    get_user_playlists(session)
+    session.revoked.add(session.tokens[0])
+    assert get_user_playlists(session) == []
+    assert len(session.tokens) == 2
+    assert (
+        session.sent_headers["authorization"] == f"Bearer {session.tokens[1]}"
+    )
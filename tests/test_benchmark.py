@@ -0,0 +1,55 @@
+import pytest
+
+from mopidy_tubeify import yt_matcher
+from mopidy_tubeify.matchcache import MatchCache
+from mopidy_tubeify.scheduler import MatcherScheduler
+
+from tests.benchmarks.matching import ReplayYTMusic, load_fixtures, run
+
+
+@pytest.fixture
+def fixtures(monkeypatch):
+    scheduler = MatcherScheduler(rate=0)
+    monkeypatch.setattr(yt_matcher, "scheduler", scheduler)
+    yield load_fixtures()
+    scheduler.shutdown()
+    yt_matcher.yt_matcher_cache.clear()
+
+
+def test_matching_corpus(fixtures):
+    ytmusic = ReplayYTMusic(fixtures)
+    report = run(fixtures, ytmusic)
+
+    assert report["unrecorded"] == []
+    # the baseline: live videos found by isrc outrank the song, and
+    # accented words are not transliterated before the common word check
+    assert report["tracks"]["correct"] >= 9
+    assert report["albums"]["correct"] == len(fixtures["albums"])
+    # every recorded response once, and the shared isrc search twice
+    assert report["ytm_calls"] <= 22
+
+
+def test_warm_run_searches_no_tracks(fixtures, tmp_path):
+    # matches are kept in memory; the unmatched, by the match store
+    store = MatchCache(tmp_path / "matches.sqlite3")
+    ytmusic = ReplayYTMusic(fixtures)
+    cold = run(fixtures, ytmusic, store=store)
+    calls = ytmusic.calls.copy()
+    warm = run(fixtures, ytmusic, warm=True, store=store)
+    store.close()
+
+    assert warm["tracks"] == cold["tracks"]
+    assert warm["cache_hits"] == len(fixtures["tracks"])
+    assert set(ytmusic.calls - calls) == {"search:albums"}
+
+
+def test_restart_is_answered_by_match_store(fixtures, tmp_path):
+    store = MatchCache(tmp_path / "matches.sqlite3")
+    ytmusic = ReplayYTMusic(fixtures)
+    cold = run(fixtures, ytmusic, store=store)
+    restart = run(fixtures, ytmusic, store=store)
+    store.close()
+
+    assert restart["tracks"] == cold["tracks"]
+    assert restart["matcher_stats"]["memory_hits"] == 0
+    assert restart["cache_hits"] == len(fixtures["tracks"])
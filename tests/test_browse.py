@@ -0,0 +1,194 @@
+import re
+import threading
+import time
+
+import pytest
+
+from mopidy_tubeify import yt_matcher
+from mopidy_tubeify.backend import TubeifyLibraryProvider
+from mopidy_tubeify.registry import ServiceRegistry
+
+
+class FakeYTMusic:
+    def __init__(self, slow_after):
+        self.slow_after = slow_after
+        self.release = threading.Event()
+
+    def search(self, query, filter=None, limit=None):
+        number = int(query.split()[-1])
+        if number >= self.slow_after:
+            self.release.wait(5)
+        return [
+            {
+                "videoId": f"video{number:06d}",
+                "title": f"song {number}",
+                "artists": [{"name": "artist"}],
+            }
+        ]
+
+
+class FakeService:
+    service_uri = "fake"
+    service_name = "Fake"
+    playlist_regex = re.compile(r"^fake/(?P<playlistid>.+)$")
+
+    def __init__(self, ytmusic, count):
+        self.ytmusic = ytmusic
+        self.count = count
+
+    def get_playlist_tracks(self, playlist):
+        tracks = [
+            {"song_name": f"song {n}", "song_artists": ["artist"], "isrc": None}
+            for n in range(self.count)
+        ]
+        return yt_matcher.search_and_get_best_match(tracks, self.ytmusic)
+
+
+class FakeBackend:
+    def __init__(self, service, partial_tracks):
+        self.services = {"fake": service}
+        self.browse_partial_tracks = partial_tracks
+        self.browse_partial_timeout = 5.0
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yt_matcher.yt_matcher_cache.clear()
+    TubeifyLibraryProvider.tubeify_cache.clear()
+    yield
+    yt_matcher.yt_matcher_cache.clear()
+    TubeifyLibraryProvider.tubeify_cache.clear()
+
+
+def test_browse_playlist():
+    ytmusic = FakeYTMusic(slow_after=10)
+    provider = TubeifyLibraryProvider(FakeBackend(FakeService(ytmusic, 3), 0))
+    refs = provider.browse("tubeify:fake:playlist_abc")
+    assert [ref.name for ref in refs] == ["song 0", "song 1", "song 2"]
+    assert provider.tubeify_cache["tubeify:fake:playlist_abc"] == refs
+
+
+def test_lookup_tracks_without_an_album():
+    # FakeYTMusic's matches have no album
+    service = FakeService(FakeYTMusic(slow_after=10), 2)
+    backend = FakeBackend(service, 0)
+    backend.services = {"spotify": service, "applemusic": service}
+    tracks = TubeifyLibraryProvider(backend).lookup("tubeify:fake/abc")
+    assert [track.name for track in tracks] == ["song 0", "song 1"]
+    assert [track.album for track in tracks] == [None, None]
+
+
+def test_lookup_albums_without_an_id():
+    class AlbumYTMusic(FakeYTMusic):
+        def search(self, query, filter=None, limit=None):
+            return [
+                dict(result, album={"name": "album", "id": None})
+                for result in super().search(query, filter, limit)
+            ]
+
+    service = FakeService(AlbumYTMusic(slow_after=10), 1)
+    backend = FakeBackend(service, 0)
+    backend.services = {"spotify": service, "applemusic": service}
+    (track,) = TubeifyLibraryProvider(backend).lookup("tubeify:fake/abc")
+    assert track.album.name == "album"
+    assert track.album.uri is None
+
+
+def test_partial_browse_completes_in_background():
+    ytmusic = FakeYTMusic(slow_after=2)
+    provider = TubeifyLibraryProvider(FakeBackend(FakeService(ytmusic, 6), 2))
+    uri = "tubeify:fake:playlist_abc"
+
+    refs = provider.browse(uri)
+    assert [ref.name for ref in refs] == ["song 0", "song 1"]
+    assert uri not in provider.tubeify_cache
+
+    ytmusic.release.set()
+    for _ in range(50):
+        if uri in provider.tubeify_cache:
+            break
+        time.sleep(0.1)
+
+    assert len(provider.browse(uri)) == 6
+
+
+class UsersService:
+    def __init__(self, name, release=None):
+        self.name = name
+        self.release = release
+
+    def get_users_details(self, users):
+        if self.release:
+            self.release.wait(5)
+        return [{"id": user, "name": f"{self.name} {user}"} for user in users]
+
+
+class UsersBackend:
+    browse_partial_tracks = 0
+
+    def __init__(self, services, timeout):
+        self.services = ServiceRegistry()
+        for service in services:
+            self.services.register(
+                service.name, lambda service=service: service, name=service.name
+            )
+        for service in services:
+            setattr(self, f"{service.name}_users", ["a", "b"])
+        self.service_timeout = timeout
+
+
+def test_all_users_lists_services_that_answer_in_time():
+    release = threading.Event()
+    provider = TubeifyLibraryProvider(
+        UsersBackend([UsersService("one"), UsersService("slow", release)], 0.2)
+    )
+
+    start = time.monotonic()
+    refs = provider.browse("tubeify:all:users")
+    assert time.monotonic() - start < 2
+    assert [ref.uri for ref in refs] == [
+        "tubeify:one:user_a",
+        "tubeify:one:user_b",
+        "tubeify:slow:users",
+    ]
+    assert refs[-1].name == "slow users (timed out)"
+    assert "tubeify:all:users" not in provider.tubeify_cache
+
+    # the late answer is kept for browsing the placeholder
+    release.set()
+    for _ in range(50):
+        if "tubeify:slow:users" in provider.tubeify_cache:
+            break
+        time.sleep(0.1)
+    assert [ref.uri for ref in provider.browse("tubeify:slow:users")] == [
+        "tubeify:slow:user_a",
+        "tubeify:slow:user_b",
+    ]
+    provider.service_executor.shutdown()
+
+
+def test_stale_listing_is_served_while_it_is_refreshed(monkeypatch):
+    class CountingService(UsersService):
+        calls = 0
+
+        def get_users_details(self, users):
+            self.calls += 1
+            if self.calls > 1:
+                self.name = "new"
+            return super().get_users_details(users)
+
+    service = CountingService("one")
+    provider = TubeifyLibraryProvider(UsersBackend([service], 1))
+    monkeypatch.setattr(provider.tubeify_cache, "ttl", 0.05)
+    monkeypatch.setattr(provider.tubeify_cache, "max_stale", 60)
+
+    assert provider.browse("tubeify:one:users")[0].name == "one a"
+    time.sleep(0.07)
+    assert provider.browse("tubeify:one:users")[0].name == "one a"
+    for _ in range(50):
+        if provider.tubeify_cache.lookup("tubeify:one:users")[1]:
+            break
+        time.sleep(0.1)
+    assert provider.browse("tubeify:one:users")[0].name == "new a"
+    assert service.calls == 2
+    provider.service_executor.shutdown()
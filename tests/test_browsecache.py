@@ -0,0 +1,186 @@
+import time
+
+from mopidy.models import Ref
+
+from mopidy_tubeify.browsecache import BrowseCache, BrowseStore, uri_kind
+
+
+def test_uri_kind():
+    assert uri_kind("tubeify:browse") == (None, "browse")
+    assert uri_kind("tubeify:all:users") == ("all", "users")
+    assert uri_kind("tubeify:kcrw:home") == ("kcrw", "home")
+    assert uri_kind("tubeify:spotify:user_abc") == ("spotify", "user")
+    assert uri_kind("tubeify:npr:playlist_abc:def") == ("npr", "playlist")
+    assert uri_kind("tubeify:kcrw:playlist_listoflists-PROGRAM-/x") == (
+        "kcrw",
+        "listoflists",
+    )
+
+
+def test_ttls_by_kind():
+    cache = BrowseCache(
+        ttl=100,
+        ttls={"home": 10, "rollingstone:playlist": 1000},
+        empty_ttl=5,
+    )
+    assert cache.ttl_for("tubeify:kcrw:home", ["ref"]) == 10
+    assert cache.ttl_for("tubeify:kcrw:playlist_1", ["ref"]) == 100
+    assert cache.ttl_for("tubeify:rollingstone:playlist_1", ["ref"]) == 1000
+    assert cache.ttl_for("tubeify:rollingstone:playlist_1", []) == 5
+
+
+def test_stale_entries():
+    cache = BrowseCache(ttl=0.05, max_stale=0.1)
+    cache["tubeify:kcrw:home"] = ["ref"]
+    assert cache.lookup("tubeify:kcrw:home") == (["ref"], True)
+
+    time.sleep(0.07)
+    assert cache.lookup("tubeify:kcrw:home") == (["ref"], False)
+
+    time.sleep(0.1)
+    assert cache.lookup("tubeify:kcrw:home") is None
+    assert len(cache) == 0
+
+
+def test_empty_listings():
+    cache = BrowseCache(ttl=100, empty_ttl=0, max_stale=100)
+    cache["tubeify:kcrw:home"] = ["ref"]
+    cache["tubeify:kcrw:home"] = []
+    assert "tubeify:kcrw:home" not in cache
+
+    cache.empty_ttl = 0.05
+    cache["tubeify:kcrw:home"] = []
+    assert cache["tubeify:kcrw:home"] == []
+    time.sleep(0.07)
+    # and are never served stale
+    assert "tubeify:kcrw:home" not in cache
+
+
+def test_least_recently_used_are_evicted():
+    cache = BrowseCache(maxsize=2)
+    cache["a"] = ["a"]
+    cache["b"] = ["b"]
+    cache["a"]
+    cache["c"] = ["c"]
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+
+
+refs = [
+    Ref.directory(
+        uri="tubeify:kcrw:playlist_1", name="Morning Becomes Eclectic"
+    ),
+    Ref.track(uri="yt:video:abcdefghijk", name="Jóga"),
+]
+
+
+def test_entries_survive_restarts(tmp_path):
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    BrowseCache(store=store)["tubeify:kcrw:home"] = refs
+    store.close()
+
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    cache = BrowseCache(store=store)
+    # the database isn't opened until it is needed
+    assert store._db is None
+    assert cache.lookup("tubeify:kcrw:home") == (refs, True)
+    assert cache.lookup("tubeify:kcrw:other") is None
+    store.close()
+
+
+def test_listings_made_from_the_config_are_not_stored(tmp_path):
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    cache = BrowseCache(store=store)
+    for uri in [
+        "tubeify:browse",
+        "tubeify:kcrw:root",
+        "tubeify:kcrw:users",
+        "tubeify:kcrw:playlists",
+        "tubeify:all:home",
+        "tubeify:all:playlists",
+    ]:
+        cache[uri] = refs
+        assert cache[uri] == refs
+    assert len(store) == 0
+
+    cache["tubeify:spotify:user_abc"] = refs
+    cache["tubeify:kcrw:playlist_listoflists-PROGRAM-/x"] = refs
+    assert len(store) == 2
+    store.close()
+
+
+def test_expired_entries_are_dropped_from_the_store(tmp_path):
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    BrowseCache(ttl=0.05, store=store)["tubeify:kcrw:home"] = refs
+    time.sleep(0.07)
+    assert "tubeify:kcrw:home" not in BrowseCache(ttl=0.05, store=store)
+    assert len(store) == 0
+    store.close()
+
+
+def test_other_versions_are_dropped(tmp_path, monkeypatch):
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    store.set("tubeify:kcrw:home", refs, time.time())
+    store.close()
+
+    monkeypatch.setattr(BrowseStore, "version", BrowseStore.version + 1)
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    assert store.get("tubeify:kcrw:home") is None
+    store.close()
+
+
+def test_store_size_budget(tmp_path):
+    store = BrowseStore(tmp_path / "browse.sqlite3", max_bytes=0)
+    store.evict_every = 1
+    for n in range(3):
+        store.set(f"tubeify:kcrw:playlist_{n}", refs, time.time())
+    # room for just these three
+    store.max_bytes = store.size()
+    store.get("tubeify:kcrw:playlist_0")
+    store.set("tubeify:kcrw:playlist_3", refs, time.time())
+
+    assert len(store) == 3
+    assert store.get("tubeify:kcrw:playlist_0") is not None
+    assert store.get("tubeify:kcrw:playlist_1") is None
+    store.close()
+
+
+def test_access_times_are_written_in_batches(tmp_path):
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    store.access_times.batch = 3
+    for uri in "abc":
+        store.set(uri, refs, time.time())
+    changes = store._db.total_changes
+    store.get("a")
+    store.get("b")
+    assert store._db.total_changes == changes
+
+    store.get("c")
+    assert store._db.total_changes == changes + 3
+
+    # and the rest when the store is closed
+    store.get("a")
+    store.close()
+    store = BrowseStore(tmp_path / "browse.sqlite3")
+    accessed = dict(store._open().execute("SELECT uri, accessed FROM refs"))
+    assert accessed["a"] > accessed["c"]
+    store.close()
+
+
+def test_least_recently_used_are_evicted_by_bytes():
+    cache = BrowseCache()
+    cache["a"] = refs
+    size = cache.stats()["bytes"]
+    cache.max_bytes = size * 2
+    cache["b"] = refs
+    cache["a"]
+    cache["c"] = refs
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.stats() == {
+        "entries": 2,
+        "bytes": size * 2,
+        "max_bytes": size * 2,
+        "evictions": 1,
+    }
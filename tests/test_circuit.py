@@ -0,0 +1,104 @@
+import datetime
+import time
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+from mopidy_tubeify import circuit
+from mopidy_tubeify.kcrw import KCRW
+from mopidy_tubeify.serviceclient import ServiceAdapter
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    # stands in for the network, under ServiceAdapter
+    class Transport:
+        def __init__(self):
+            self.sent = []
+            self.status = 200
+            self.fail = False
+
+        def send(self, adapter, request, timeout=None, **kwargs):
+            self.sent.append(timeout)
+            if self.fail:
+                raise requests.exceptions.ConnectTimeout(request=request)
+            response = Response()
+            response.status_code = self.status
+            response.request = request
+            response.url = request.url
+            response.elapsed = datetime.timedelta(0)
+            return response
+
+    transport = Transport()
+    monkeypatch.setattr(
+        HTTPAdapter,
+        "send",
+        lambda adapter, request, **kwargs: transport.send(
+            adapter, request, **kwargs
+        ),
+    )
+    return transport
+
+
+def test_breaker_opens_and_recovers():
+    breaker = circuit.CircuitBreaker("test", failures=2, cool_down=0.1)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.allow()  # a single trial call
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_adapter_applies_deadline_and_breaker(transport):
+    session = requests.Session()
+    breaker = circuit.CircuitBreaker("test", failures=2, cool_down=60)
+    session.mount("https://", ServiceAdapter("test", (1, 2), breaker))
+
+    session.get("https://example.com/")
+    session.get("https://example.com/", timeout=5)
+    assert transport.sent == [(1, 2), 5]
+
+    transport.fail = True
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            session.get("https://example.com/")
+
+    with pytest.raises(circuit.CircuitOpenError):
+        session.get("https://example.com/")
+    assert len(transport.sent) == 4
+
+
+def test_server_errors_count_as_failures(transport):
+    breaker = circuit.CircuitBreaker("test", failures=1, cool_down=60)
+    session = requests.Session()
+    session.mount("https://", ServiceAdapter("test", (1, 2), breaker))
+
+    transport.status = 503
+    session.get("https://example.com/")
+    assert breaker.state == "open"
+
+
+def test_service_session_gets_adapter_once():
+    KCRW(None, {}, None)
+    client = KCRW(None, {}, None)
+    adapter = client.session.get_adapter("https://")
+    assert isinstance(adapter, ServiceAdapter)
+    assert adapter.service == "kcrw"
+    assert adapter.timeout == (6.05, 27)
+    assert adapter.max_retries.total == 3
+    assert adapter.breaker is circuit.breakers["kcrw"]
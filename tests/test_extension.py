@@ -61,6 +61,7 @@ def test_get_config_schema():
     assert "applemusic_playlists" in schema
     assert "spotify_users" in schema
     assert "tidal_playlists" in schema
+    assert "match_cache_ttl" in schema
 
 
 
@@ -0,0 +1,207 @@
+import datetime
+import time
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from mopidy_tubeify import circuit, httpcache, spotify
+from mopidy_tubeify.httpcache import HTTPCache
+from mopidy_tubeify.serviceclient import ServiceAdapter, ServiceClient
+from mopidy_tubeify.spotify import Spotify
+
+url = "https://example.com/list"
+
+
+@pytest.fixture
+def site(monkeypatch):
+    # stands in for a site, under ServiceAdapter; answers conditional
+    # requests for an unchanged page with 304
+    class Site:
+        def __init__(self):
+            self.requests = []
+            self.headers = {"ETag": '"v1"'}
+            self.content = b"<p>the 500 greatest albums</p>"
+
+        def send(self, adapter, request, **kwargs):
+            self.requests.append(request)
+            response = Response()
+            response.request = request
+            response.url = request.url
+            response.elapsed = datetime.timedelta(0)
+            response.headers = CaseInsensitiveDict(self.headers)
+            etag = self.headers.get("ETag")
+            if etag and request.headers.get("If-None-Match") == etag:
+                response.status_code = 304
+                response._content = b""
+            else:
+                response.status_code = 200
+                response._content = self.content
+            return response
+
+    site = Site()
+    monkeypatch.setattr(
+        HTTPAdapter,
+        "send",
+        lambda adapter, request, **kwargs: site.send(
+            adapter, request, **kwargs
+        ),
+    )
+    return site
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = HTTPCache(tmp_path / "pages.sqlite3")
+    monkeypatch.setattr(ServiceClient, "http_cache", cache)
+    monkeypatch.setattr(ServiceClient, "http_cache_min_fresh", {})
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def session():
+    session = requests.Session()
+    breaker = circuit.CircuitBreaker("test", failures=0)
+    session.mount("https://", ServiceAdapter("test", (1, 2), breaker))
+    return session
+
+
+def test_freshness():
+    def freshness(**headers):
+        return httpcache.freshness(CaseInsensitiveDict(headers))
+
+    assert freshness() == 0
+    assert freshness(**{"cache-control": "public, max-age=600"}) == 600
+    assert freshness(**{"Cache-Control": "no-cache"}) == 0
+    assert freshness(**{"Cache-Control": "no-store"}) is None
+    assert freshness(Vary="*") is None
+    assert (
+        freshness(
+            Date="Sun, 18 Oct 2026 12:00:00 GMT",
+            Expires="Sun, 18 Oct 2026 13:00:00 GMT",
+        )
+        == 3600
+    )
+
+
+def test_fresh_pages_come_from_disk(site, cache, session, tmp_path):
+    site.headers["Cache-Control"] = "max-age=600"
+    assert session.get(url).content == site.content
+    assert session.get(url).content == site.content
+    assert len(site.requests) == 1
+
+    # and still do after a restart
+    cache.close()
+    ServiceClient.http_cache = HTTPCache(tmp_path / "pages.sqlite3")
+    response = session.get(url)
+    assert response.from_cache
+    assert response.text == site.content.decode()
+    assert len(site.requests) == 1
+    assert ServiceClient.http_cache.stats()["hits"] == 1
+    ServiceClient.http_cache.close()
+
+
+def test_stale_pages_are_revalidated(site, cache, session):
+    session.get(url)
+    response = session.get(url)
+    assert response.status_code == 200
+    assert response.content == site.content
+    assert site.requests[1].headers["If-None-Match"] == '"v1"'
+
+    site.headers = {"ETag": '"v2"'}
+    site.content = b"<p>the 500 greatest songs</p>"
+    assert session.get(url).content == site.content
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["revalidated"], stats["hits"]) == (2, 1, 0)
+    assert stats["entries"] == 1
+
+
+def test_service_min_fresh(site, cache, session):
+    ServiceClient.http_cache_min_fresh = {"test": 60}
+    session.get(url)
+    session.get(url)
+    assert len(site.requests) == 1
+
+
+def test_uncacheable_requests(site, cache, session):
+    site.headers = {"ETag": '"v1"', "Cache-Control": "no-store"}
+    session.get(url)
+    site.headers = {"ETag": '"v1"', "Cache-Control": "max-age=600"}
+    session.get(f"{url}?token", headers={"Authorization": "Bearer token"})
+    session.post(url)
+    assert len(cache) == 0
+
+
+def test_tokens_are_not_sent_with_scraped_pages(site, cache, monkeypatch):
+    class Scraper(ServiceClient):
+        service_uri = "scraper"
+
+    # each class makes its session the first time it is used
+    monkeypatch.delattr(ServiceClient, "session", raising=False)
+    monkeypatch.delattr(Spotify, "session", raising=False)
+    monkeypatch.setattr(
+        spotify,
+        "_tokens",
+        {
+            "https://open.spotify.com": {
+                "access_token": "token",
+                "expires": time.time() + 3600,
+            }
+        },
+    )
+    # the backend gives every service the same headers
+    headers = {"User-Agent": "tubeify"}
+    spotify_client = Spotify(None, headers, None)
+    scraper = Scraper(None, headers, None)
+
+    site.headers["Cache-Control"] = "max-age=600"
+    site.content = b"{}"
+    Spotify._spotify_get(spotify_client, "https://api.spotify.com/v1/me")
+    assert site.requests[-1].headers["authorization"] == "Bearer token"
+
+    scraper.session.get(url)
+    assert scraper.session.get(url).from_cache
+    assert "authorization" not in site.requests[-1].headers
+    assert len(site.requests) == 2
+    assert headers == {"User-Agent": "tubeify"}
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = HTTPCache(tmp_path / "pages.sqlite3", max_bytes=250)
+    cache.set("a", 200, {}, b"a" * 100, 0)
+    cache.set("b", 200, {}, b"b" * 100, 0)
+    cache.get("a")
+    cache.set("c", 200, {}, b"c" * 100, 0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 202, 1)
+    cache.close()
+
+
+def test_access_times_are_written_in_batches(tmp_path):
+    cache = HTTPCache(tmp_path / "pages.sqlite3")
+    cache.access_times.batch = 3
+    for page in "abc":
+        cache.set(page, 200, {}, b"page", 0)
+    changes = cache._db.total_changes
+    cache.get("a")
+    cache.get("b")
+    assert cache._db.total_changes == changes
+
+    cache.get("c")
+    assert cache._db.total_changes == changes + 3
+
+    # and the rest when the cache is closed
+    cache.get("a")
+    cache.close()
+    cache = HTTPCache(tmp_path / "pages.sqlite3")
+    accessed = dict(cache._db.execute("SELECT url, accessed FROM responses"))
+    assert accessed["a"] > accessed["c"]
+    cache.close()
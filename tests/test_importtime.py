@@ -0,0 +1,69 @@
+import subprocess
+import sys
+
+# generous budgets, in microseconds, of the cumulative import times
+# reported by `python -X importtime` (mopidy itself is imported first,
+# and not counted); around 30ms and 300ms when these were set
+extension_budget = 250_000
+backend_budget = 1_500_000
+
+service_modules = [
+    "mopidy_tubeify.allmusic",
+    "mopidy_tubeify.amrap",
+    "mopidy_tubeify.apple",
+    "mopidy_tubeify.discogs",
+    "mopidy_tubeify.farout",
+    "mopidy_tubeify.fmspins",
+    "mopidy_tubeify.kcrw",
+    "mopidy_tubeify.musicreviewworld",
+    "mopidy_tubeify.nme",
+    "mopidy_tubeify.npr",
+    "mopidy_tubeify.paste",
+    "mopidy_tubeify.pitchfork",
+    "mopidy_tubeify.rollingstone",
+    "mopidy_tubeify.spotify",
+    "mopidy_tubeify.tidal",
+    "mopidy_tubeify.tripler",
+    "mopidy_tubeify.whathifi",
+]
+
+
+def import_times(module):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-W",
+            "ignore",
+            "-X",
+            "importtime",
+            "-c",
+            f"import mopidy; import {module}",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # the modules imported by `import module`, after mopidy's
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            _, cumulative, name = line[len("import time:") :].split("|")
+            if name == " mopidy":
+                times = {}
+            elif cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_extension_import():
+    times = import_times("mopidy_tubeify")
+    assert "pkg_resources" not in times
+    assert times["mopidy_tubeify"] < extension_budget
+
+
+def test_backend_imports_no_services():
+    times = import_times("mopidy_tubeify.backend")
+    imported = set(times)
+    assert imported.isdisjoint(service_modules)
+    assert imported.isdisjoint(["bs4", "ytmusicapi"])
+    assert times["mopidy_tubeify.backend"] < backend_budget
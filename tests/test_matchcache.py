@@ -0,0 +1,215 @@
+import time
+
+import pytest
+
+from mopidy_tubeify import yt_matcher
+from mopidy_tubeify.matchcache import MatchCache, match_key, track_record
+
+track = {
+    "song_name": "Paranoid Android",
+    "song_artists": ["Radiohead"],
+    "song_duration": 387,
+    "isrc": "GBAYE9700130",
+}
+
+result = {
+    "videoId": "fHiGbolFFGw",
+    "title": "Paranoid Android",
+    "artists": [{"name": "Radiohead", "id": "UCq19-LqvG35A-30oyAiPiqA"}],
+    "duration_seconds": 387,
+}
+
+
+class OfflineYTMusic:
+    def __getattr__(self, name):
+        raise AssertionError(f"unexpected YouTube Music call: {name}")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MatchCache(tmp_path / "matches.sqlite3")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def matcher_store(store):
+    yt_matcher.yt_matcher_cache.clear()
+    yt_matcher.match_store = store
+    yield store
+    yt_matcher.match_store = None
+    yt_matcher.yt_matcher_cache.clear()
+
+
+def test_match_key_normalizes():
+    assert match_key(
+        "Paranoid  Android", ["Radiohead", "Thom Yorke"], "gbaye9700130", 387
+    ) == match_key(
+        "paranoid android", ["thom yorke", "RADIOHEAD"], "GBAYE9700130", 387
+    )
+    assert match_key("a", ["b"], None, 1) != match_key("a", ["b"], None, 2)
+
+
+def test_roundtrip_survives_reopen(tmp_path):
+    key = match_key(**track)
+    store = MatchCache(tmp_path / "matches.sqlite3")
+    store.set(key, result)
+    store.close()
+
+    store = MatchCache(tmp_path / "matches.sqlite3")
+    assert store.get(key) == result
+    store.close()
+
+
+def test_expired_entries_are_ignored(tmp_path):
+    store = MatchCache(tmp_path / "matches.sqlite3", ttl=1)
+    store.set("key", result)
+    store._db.execute("UPDATE matches SET created = ?", (time.time() - 2,))
+    assert store.get("key") is None
+    store.close()
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    store = MatchCache(tmp_path / "matches.sqlite3", max_entries=2)
+    store.evict_every = 1
+    store.set("a", result)
+    store.set("b", result)
+    store.get("a")
+    store.set("c", result)
+    assert store.get("b") is None
+    assert store.get("a") == result
+    assert len(store) == 2
+    store.close()
+
+
+def test_stored_match_needs_no_ytmusic(matcher_store):
+    matcher_store.set(match_key(**track), result)
+    matched = yt_matcher.search_and_get_best_match(
+        [dict(track)], OfflineYTMusic()
+    )
+    assert matched[0]["videoId"] == result["videoId"]
+
+
+def test_misses_back_off_exponentially(store):
+    store.set_miss("key")
+    assert store.is_miss("key")
+    (retry_at,) = store._db.execute("SELECT retry_at FROM misses").fetchone()
+    assert retry_at == pytest.approx(time.time() + 3600, abs=5)
+
+    store.set_miss("key")
+    (retry_at,) = store._db.execute("SELECT retry_at FROM misses").fetchone()
+    assert retry_at == pytest.approx(time.time() + 7200, abs=5)
+
+    store.set("key", result)
+    assert not store.is_miss("key")
+
+
+def test_unmatched_track_is_not_searched_again(matcher_store):
+    class EmptyYTMusic:
+        calls = 0
+
+        def search(self, *args, **kwargs):
+            self.calls += 1
+            return []
+
+    ytmusic = EmptyYTMusic()
+    unmatched = dict(track, isrc=None)
+    yt_matcher.search_and_get_best_match([dict(unmatched)], ytmusic)
+    assert ytmusic.calls == 2  # songs, then videos
+    assert matcher_store.is_miss(match_key(**unmatched))
+
+    yt_matcher.yt_matcher_cache.clear()
+    yt_matcher.search_and_get_best_match([dict(unmatched)], ytmusic)
+    assert ytmusic.calls == 2
+
+
+def test_isrc_index_answers_other_playlists(matcher_store):
+    matcher_store.set_isrc(track["isrc"], dict(result, category="Songs"))
+
+    # same recording, as listed by another service
+    matched = yt_matcher.search_and_get_best_match(
+        [
+            {
+                "song_name": "Paranoid Android (Remastered)",
+                "song_artists": ["RADIOHEAD"],
+                "song_duration": 386,
+                "isrc": "gbaye9700130",
+            }
+        ],
+        OfflineYTMusic(),
+    )
+    assert matched[0]["videoId"] == result["videoId"]
+    assert "category" not in matched[0]
+
+
+def test_isrc_index_export_import(store, tmp_path):
+    store.set_isrc(track["isrc"], result)
+    assert store.export_isrcs(tmp_path / "isrcs.json") == 1
+
+    other = MatchCache(tmp_path / "other.sqlite3")
+    assert other.import_isrcs(tmp_path / "isrcs.json") == 1
+    assert other.get_isrc(track["isrc"]) == store.get_isrc(track["isrc"])
+    other.close()
+
+
+def test_matches_are_track_records(matcher_store):
+    class SearchYTMusic:
+        def search(self, *args, **kwargs):
+            return [
+                dict(
+                    result,
+                    category="Songs",
+                    resultType="song",
+                    feedbackTokens={"add": "token"},
+                )
+            ]
+
+    matched = yt_matcher.search_and_get_best_match(
+        [dict(track)], SearchYTMusic()
+    )
+    assert matched == [track_record(result)]
+    assert matcher_store.get(match_key(**track)) == track_record(result)
+
+
+def test_records_of_other_versions_are_projected(tmp_path):
+    store = MatchCache(tmp_path / "matches.sqlite3")
+    store.set("key", dict(result, resultType="song"))
+    store._db.execute("PRAGMA user_version = 0")
+    store.close()
+
+    store = MatchCache(tmp_path / "matches.sqlite3")
+    assert store.get("key") == track_record(result)
+    store.close()
+
+
+def test_access_times_are_written_in_batches(store):
+    store.access_times.batch = 3
+    for key in "abc":
+        store.set(key, result)
+    changes = store._db.total_changes
+    store.get("a")
+    store.get("b")
+    assert store._db.total_changes == changes
+
+    store.get("c")
+    assert store._db.total_changes == changes + 3
+
+
+def test_misses_are_retried_once_their_back_off_runs_out(matcher_store):
+    class EmptyYTMusic:
+        calls = 0
+
+        def search(self, *args, **kwargs):
+            self.calls += 1
+            return []
+
+    ytmusic = EmptyYTMusic()
+    unmatched = dict(track, isrc=None)
+    yt_matcher.search_and_get_best_match([dict(unmatched)], ytmusic)
+    yt_matcher.search_and_get_best_match([dict(unmatched)], ytmusic)
+    assert ytmusic.calls == 2
+
+    # without waiting for the in-memory cache's ttl
+    matcher_store._db.execute("UPDATE misses SET retry_at = 0")
+    yt_matcher.search_and_get_best_match([dict(unmatched)], ytmusic)
+    assert ytmusic.calls == 4
@@ -0,0 +1,107 @@
+import pytest
+from mopidy.models import Ref
+
+from mopidy_tubeify import Extension, metrics, timing
+from mopidy_tubeify.browsecache import BrowseCache
+from mopidy_tubeify.httpcache import HTTPCache
+from mopidy_tubeify.web import MetricsHandler
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_is_cumulative():
+    histogram = metrics.Histogram((1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+
+    assert list(histogram.samples("calls", 'service="x"')) == [
+        'calls_bucket{service="x",le="1"} 2',
+        'calls_bucket{service="x",le="5"} 3',
+        'calls_bucket{service="x",le="+Inf"} 4',
+        'calls_sum{service="x"} 14.5',
+        'calls_count{service="x"} 4',
+    ]
+
+
+def test_responses_are_recorded_per_service():
+    for status in (200, 200, 503):
+        metrics.record_response("kcrw", status, 0.2)
+    metrics.record_error("kcrw")
+
+    text = metrics.render()
+    assert 'tubeify_http_requests_total{service="kcrw"} 4' in text
+    assert 'tubeify_http_errors_total{service="kcrw"} 1' in text
+    assert 'tubeify_http_responses_total{service="kcrw",code="503"} 1' in text
+    assert (
+        'tubeify_http_request_duration_seconds_bucket{service="kcrw",le="0.25"}'
+        " 3" in text
+    )
+
+
+def test_browse_ytm_calls():
+    with timing.trace("browse") as trace:
+        timing.count("ytm_songs", 3)
+        timing.count("ytm_videos", 1)
+        timing.count("tracks", 3)
+    metrics.record_browse(trace)
+
+    assert 'tubeify_browse_ytm_calls_bucket{le="5"} 1' in metrics.render()
+
+
+def test_every_sample_is_declared():
+    metrics.caches["test"] = {"a": 1}
+    try:
+        lines = metrics.render().splitlines()
+    finally:
+        del metrics.caches["test"]
+
+    assert 'tubeify_cache_entries{cache="test"} 1' in lines
+    declared = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+    for line in lines:
+        if not line.startswith("#"):
+            name = line.split("{")[0].split()[0]
+            assert any(name.startswith(metric) for metric in declared), line
+
+
+def test_metrics_route():
+    routes = Extension().factory({}, None)
+    assert (r"/metrics", MetricsHandler) in [route[:2] for route in routes]
+
+
+def test_http_cache_stats(tmp_path):
+    cache = HTTPCache(tmp_path / "pages.sqlite3")
+    cache.set("https://example.com/", 200, {}, b"page", 0)
+    cache.count("hits")
+    metrics.caches["http"] = cache
+    try:
+        lines = metrics.render().splitlines()
+    finally:
+        del metrics.caches["http"]
+        cache.close()
+
+    assert 'tubeify_http_cache_total{result="hits"} 1' in lines
+    assert 'tubeify_cache_bytes{cache="http"} 24' in lines
+    assert not any(
+        line.startswith("tubeify_http_cache_bytes") for line in lines
+    )
+    assert 'tubeify_cache_entries{cache="http"} 1' in lines
+
+
+def test_cache_stats():
+    cache = BrowseCache()
+    cache["tubeify:kcrw:home"] = [Ref.directory(uri="tubeify:kcrw:x", name="x")]
+    metrics.caches["test"] = cache
+    try:
+        stats = metrics.cache_stats()
+        lines = metrics.render().splitlines()
+    finally:
+        del metrics.caches["test"]
+
+    assert stats["test"]["entries"] == 1
+    assert f'tubeify_cache_bytes{{cache="test"}} {cache.currsize}' in lines
+    assert 'tubeify_cache_evictions_total{cache="test"} 0' in lines
@@ -0,0 +1,139 @@
+import importlib.util
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+from requests.models import Response
+
+from mopidy_tubeify import timing
+from mopidy_tubeify.npr import NPR
+from mopidy_tubeify.serviceclient import ServiceClient, compile_strainer
+
+from tests.benchmarks.parsing import make_page, service_classes
+
+pages = [
+    (service, items_type, schema)
+    for service in service_classes().values()
+    for items_type, schema in service.service_schema.items()
+]
+
+
+def get_items(service, content, items_type, parser="html.parser"):
+    response = Response()
+    response._content = content.encode("utf-8")
+    client = service.__new__(service)
+    client.html_parser = parser
+    return client._get_items_soup(response, items_type)
+
+
+@pytest.mark.parametrize(
+    "service,items_type,schema",
+    pages,
+    ids=[f"{s.service_uri}-{items_type}" for s, items_type, _ in pages],
+)
+@pytest.mark.parametrize("parser", ["html.parser", ServiceClient.html_parser])
+def test_parsers_find_same_items(service, items_type, schema, parser):
+    if parser != "html.parser" and not importlib.util.find_spec(parser):
+        pytest.skip(f"{parser} is not installed")
+    timing.reset()
+    content = make_page(schema, items=5, filler=10)
+    items = get_items(service, content, items_type, parser)
+    expected = get_items(service, content, items_type, "html5lib")
+
+    assert items
+    assert [str(item) for item in items] == [str(item) for item in expected]
+    assert "parser_fallbacks" not in timing.stats()["counters"]
+
+
+def test_missing_container_falls_back_to_html5lib():
+    class Service(ServiceClient):
+        service_schema = {
+            "items": {
+                "container": {"name": "table", "attrs": {"id": "chart"}},
+                "item": {"name": "tr"},
+            }
+        }
+
+    timing.reset()
+    assert get_items(Service, "<p>nothing here</p>", "items") == []
+    assert timing.stats()["counters"]["parser_fallbacks"] == 1
+
+    # tr outside of a table: html5lib drops it, as a browser would
+    content = '<div id="chart"><tr><td>1</td></tr></div>'
+    assert get_items(Service, content, "items") == []
+    assert timing.stats()["counters"]["parser_fallbacks"] == 2
+
+
+def test_whole_pages_use_html5lib():
+    soup = get_items(ServiceClient, "<p>one<p>two", "")
+    # html5lib builds the whole document
+    assert soup.html.body is not None
+    assert len(soup.find_all("p")) == 2
+
+
+def test_missing_parser_falls_back_to_html5lib(monkeypatch):
+    monkeypatch.setattr(ServiceClient, "html_parser", "no-such-parser")
+    client = ServiceClient.__new__(ServiceClient)
+    soup = client._parse("<p>one</p>", "no-such-parser")
+    assert soup.p.text == "one"
+    assert ServiceClient.html_parser == "html5lib"
+
+
+def test_default_parser_closes_list_items(monkeypatch):
+    # html.parser would give "abc", "bc" and "c"
+    class Service(ServiceClient):
+        service_schema = {"items": {"item": {"name": "li"}}}
+
+    monkeypatch.setattr(ServiceClient, "html_parser", ServiceClient.html_parser)
+    items = get_items(
+        Service, "<ul><li>a<li>b<li>c</ul>", "items", Service.html_parser
+    )
+    assert [item.text for item in items] == ["a", "b", "c"]
+
+
+def test_strainer_keeps_only_schema_tags():
+    schema = {
+        "container": {"name": "div", "attrs": {"class": "chart"}},
+        "item": {"name": "li"},
+    }
+    soup = BeautifulSoup(
+        '<ul><li>menu</li></ul><div class="chart wide"><ul><li>one</li>'
+        "<li>two</li></ul></div><footer>...</footer>",
+        "html.parser",
+        parse_only=compile_strainer(schema),
+    )
+    assert [tag.name for tag in soup.find_all(True)] == [
+        "div",
+        "ul",
+        "li",
+        "li",
+    ]
+
+
+def test_strainer_leaves_strings_to_select():
+    class Service(ServiceClient):
+        service_schema = {
+            "state": {
+                "item": {"name": "script", "string": re.compile(r"^state =")}
+            }
+        }
+
+    timing.reset()
+    content = "<script>other = 1</script><script>state = 2</script>"
+    items = get_items(Service, content, "state")
+    assert [item.string for item in items] == ["state = 2"]
+    assert "parser_fallbacks" not in timing.stats()["counters"]
+
+
+def test_npr_lists_keep_the_tags_after_their_headings():
+    content = (
+        '<div class="storytext"><h6 class="edTag">1. First list</h6>'
+        '<p class="edTag">intro</p><h3 class="edTag">"One"</h3>'
+        '<h3 class="edTag">"Two"</h3>'
+        '<h6 class="edTag">2. Second list</h6><h3 class="edTag">"Three"</h3>'
+        "</div>"
+    )
+    response = Response()
+    response._content = content.encode("utf-8")
+    client = NPR.__new__(NPR)
+    assert client._get_NPR_json(response) == [["One", "Two"], ["Three"]]
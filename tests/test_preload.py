@@ -0,0 +1,39 @@
+import pytest
+
+from mopidy_tubeify.preload import preload_record, preload_uri
+
+from tests.benchmarks.preload import full_uri, matched_tracks
+
+youtube_data = pytest.importorskip("mopidy_youtube.data")
+
+
+def test_mopidy_youtube_reads_the_same_tracks():
+    tracks = matched_tracks(20)
+    full = full_uri(tracks[0]["videoId"], tracks)
+    compact = preload_uri(tracks[0]["videoId"], tracks)
+
+    preloaded = youtube_data.extract_preload_tracks(compact)
+    assert preloaded == youtube_data.extract_preload_tracks(full)
+    assert len(compact) < len(full) / 2
+
+
+def test_preload_record():
+    track = {
+        "videoId": "abcdefghijk",
+        "title": "Jóga",
+        "duration_seconds": 305,
+        "artists": [{"name": "Björk", "id": "UC1", "extra": True}],
+        "album": {"name": "Homogenic", "id": "MPRE1", "extra": True},
+        "thumbnail": {"thumbnails": [{"url": "small"}, {"url": "large"}]},
+        "feedbackTokens": {"add": "token"},
+        "song_name": "Jóga",
+        "isrc": "GBAAA9700001",
+    }
+    assert preload_record(track) == {
+        "videoId": "abcdefghijk",
+        "title": "Jóga",
+        "lengthSeconds": 305,
+        "artists": [{"name": "Björk", "id": "UC1"}],
+        "album": {"name": "Homogenic", "id": "MPRE1"},
+        "thumbnails": [{"url": "large"}],
+    }
@@ -0,0 +1,93 @@
+import sys
+import time
+
+from mopidy_tubeify.backend import TubeifyLibraryProvider
+from mopidy_tubeify.registry import ServiceRegistry
+
+
+class Service:
+    made = []
+    uri_images = {"abc": "https://example.com/abc.png"}
+    service_image = "https://example.com/service.png"
+
+    def __init__(self, name):
+        self.made.append(name)
+
+
+class Backend:
+    def __init__(self):
+        Service.made = []
+        self.services = ServiceRegistry()
+        for name in ("one", "two"):
+            self.services.register(
+                name,
+                Service,
+                name,
+                name=name.title(),
+                image=f"https://example.com/{name}.png",
+            )
+
+
+def test_services_are_made_on_first_use():
+    backend = Backend()
+    assert "one" in backend.services
+    assert list(backend.services) == ["one", "two"]
+    assert backend.services.name("two") == "Two"
+    assert backend.services.started("one") is None
+    assert Service.made == []
+
+    service = backend.services["one"]
+    assert backend.services["one"] is service
+    assert backend.services.started("one") is service
+    assert Service.made == ["one"]
+
+
+def test_warm_up_makes_every_service():
+    backend = Backend()
+    backend.services.warm_up()
+    for _ in range(50):
+        if len(Service.made) == 2:
+            break
+        time.sleep(0.01)
+    assert sorted(Service.made) == ["one", "two"]
+
+
+def test_browsing_root_and_images_make_no_services():
+    backend = Backend()
+    provider = TubeifyLibraryProvider(backend)
+    refs = provider._browse("tubeify:browse")
+    assert [ref.name for ref in refs][2:] == ["One", "Two"]
+
+    images = provider.get_images(
+        ["tubeify:one:root", "tubeify:one:playlist_abc"]
+    )
+    assert [image.uri for (image,) in images.values()] == [
+        "https://example.com/one.png",
+        "https://example.com/one.png",
+    ]
+    assert Service.made == []
+
+    backend.services["one"]
+    images = provider.get_images(["tubeify:one:playlist_abc"])
+    assert images["tubeify:one:playlist_abc"][0].uri == (
+        "https://example.com/abc.png"
+    )
+    provider.service_executor.shutdown()
+
+
+def test_service_modules_are_imported_on_first_use(tmp_path, monkeypatch):
+    (tmp_path / "lazyservice.py").write_text(
+        "class Lazy:\n"
+        "    service_name = 'Lazy'\n"
+        "    service_image = None\n"
+        "    def __init__(self, argument):\n"
+        "        self.argument = argument\n"
+    )
+    monkeypatch.syspath_prepend(tmp_path)
+    services = ServiceRegistry()
+    services.register("lazy", "lazyservice:Lazy", "argument")
+    assert "lazyservice" not in sys.modules
+
+    assert services.name("lazy") == "Lazy"
+    assert services["lazy"].argument == "argument"
+    monkeypatch.delitem(sys.modules, "lazyservice")
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from mopidy_tubeify.scheduler import (
+    AdaptiveLimiter,
+    MatcherScheduler,
+    TokenBucket,
+)
+
+
+class ThrottledError(Exception):
+    def __init__(self):
+        super().__init__("Server returned HTTP 429: Too Many Requests")
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # two from the burst, then four at 20 per second
+    assert time.monotonic() - start == pytest.approx(0.2, abs=0.1)
+
+
+def test_limiter_grows_when_fast_and_halves_when_throttled():
+    limiter = AdaptiveLimiter(4, 1, 8, target_latency=1.0)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert int(limiter.limit) == 7
+
+    limiter.acquire()
+    limiter.release(0.1, failed=True)
+    assert int(limiter.limit) == 3
+
+
+def test_throttled_calls_are_retried():
+    scheduler = MatcherScheduler(rate=0)
+    scheduler.retry_delay = 0.01
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ThrottledError()
+        return "ok"
+
+    assert scheduler.call(flaky) == "ok"
+    assert scheduler.stats()["throttled"] == 2
+    # halved twice, then grown again by the successful call
+    assert scheduler.stats()["concurrency_limit"] == 2
+    scheduler.shutdown()
+
+
+def test_other_errors_are_not_retried():
+    scheduler = MatcherScheduler(rate=0)
+
+    def broken():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        scheduler.call(broken)
+    assert scheduler.stats()["errors"] == 1
+    scheduler.shutdown()
@@ -0,0 +1,36 @@
+import pytest
+
+from mopidy_tubeify import yt_matcher
+
+from tests.benchmarks.scoring import corpus, ranking, reference_order_yt_results
+
+
+@pytest.mark.parametrize("workers", [1, -1])
+def test_ranking_unchanged(workers, monkeypatch):
+    monkeypatch.setattr(yt_matcher, "scoring_workers", workers)
+    for case in corpus(tracks=100):
+        assert ranking(yt_matcher._order_yt_results(*case)) == ranking(
+            reference_order_yt_results(*case)
+        )
+
+
+def test_no_results():
+    assert yt_matcher._order_yt_results([], "song", ["artist"], "t", 0) == []
+
+
+def test_album_check_uses_normalized_names():
+    class FakeYTMusic:
+        def search(self, query, filter=None, limit=None):
+            return [
+                {
+                    "type": "Album",
+                    "title": "Ágætis byrjun",
+                    "browseId": "MPREb_abc",
+                    "artists": [{"name": "Sigur Rós"}],
+                }
+            ]
+
+    result = yt_matcher.search_and_get_best_album(
+        (["Sigur Ros"], "Agaetis Byrjun"), FakeYTMusic()
+    )
+    assert [album["browseId"] for album in result] == ["MPREb_abc"]
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mopidy_tubeify import yt_matcher
+from mopidy_tubeify.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced():
+    flights = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        time.sleep(0.2)
+        return value * 2
+
+    with ThreadPoolExecutor(4) as executor:
+        first = executor.submit(flights.do, "kind", "key", slow, 21)
+        started.wait()
+        others = [
+            executor.submit(flights.do, "kind", "key", slow, 21)
+            for _ in range(3)
+        ]
+        results = [first.result()] + [other.result() for other in others]
+
+    assert results == [42] * 4
+    assert calls == [21]
+    assert flights.stats() == {"kind": {"issued": 1, "coalesced": 3}}
+    assert flights.in_flight() == 0
+
+
+def test_exceptions_are_shared_and_not_remembered():
+    flights = SingleFlight()
+
+    def broken():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        flights.do("kind", "key", broken)
+    assert flights.do("kind", "key", lambda: "fine") == "fine"
+
+
+def test_matcher_searches_once_for_concurrent_duplicates():
+    class SlowYTMusic:
+        def __init__(self):
+            self.queries = []
+
+        def search(self, query, filter=None, limit=None):
+            self.queries.append((query, filter))
+            time.sleep(0.2)
+            return [
+                {
+                    "videoId": "fHiGbolFFGw",
+                    "title": "Paranoid Android",
+                    "artists": [{"name": "Radiohead"}],
+                    "duration_seconds": 387,
+                }
+            ]
+
+    ytmusic = SlowYTMusic()
+    track = {
+        "song_name": "Paranoid Android",
+        "song_artists": ["Radiohead"],
+        "song_duration": 387,
+        "isrc": None,
+    }
+    yt_matcher.yt_matcher_cache.clear()
+    matched = yt_matcher.search_and_get_best_match(
+        [dict(track) for _ in range(4)], ytmusic
+    )
+    assert [track["videoId"] for track in matched] == ["fHiGbolFFGw"] * 4
+    assert len(ytmusic.queries) == 1
+    yt_matcher.yt_matcher_cache.clear()
@@ -0,0 +1,62 @@
+import sys
+import time
+
+import pytest
+from cachetools import cached
+from mopidy.models import Ref
+
+from mopidy_tubeify.sizedcache import SizedTTLCache, getsizeof
+
+
+def test_getsizeof_counts_contents_once():
+    name = "Paranoid Android" * 10
+    assert getsizeof(name) == sys.getsizeof(name)
+    names = [name, name]
+    assert getsizeof(names) == sys.getsizeof(names) + sys.getsizeof(name)
+    assert getsizeof({"title": name}) > getsizeof(name)
+    assert getsizeof([Ref.track(uri="yt:video:x", name=name)]) > getsizeof(name)
+
+
+def test_least_recently_used_are_evicted_by_bytes():
+    cache = SizedTTLCache(max_bytes=250, ttl=100, getsizeof=len)
+    cache["a"] = "a" * 100
+    cache["b"] = "b" * 100
+    cache["a"]
+    cache["c"] = "c" * 100
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.stats() == {
+        "entries": 2,
+        "bytes": 200,
+        "max_bytes": 250,
+        "evictions": 1,
+    }
+
+    with pytest.raises(ValueError):
+        cache["d"] = "d" * 300
+
+
+def test_entries_expire():
+    cache = SizedTTLCache(max_bytes=0, ttl=0.05)
+    cache["a"] = "a"
+    assert cache["a"] == "a"
+    time.sleep(0.07)
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 0
+
+
+def test_cached():
+    cache = SizedTTLCache(max_bytes=100, ttl=100, getsizeof=len)
+    calls = []
+
+    @cached(cache=cache)
+    def repeat(text, times):
+        calls.append(text)
+        return text * times
+
+    assert repeat("a", 10) == repeat("a", 10)
+    # too large to keep
+    repeat("b", 200)
+    repeat("b", 200)
+    assert calls == ["a", "b", "b"]
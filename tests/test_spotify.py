@@ -0,0 +1,63 @@
+import json
+import time
+
+import pytest
+
+from mopidy_tubeify import spotify
+from mopidy_tubeify.farout import FarOut
+from mopidy_tubeify.spotify import Spotify
+
+
+def token_page(session, url):
+    # open.spotify.com's page, with a new token each time
+    if not url.endswith("/__noul__"):
+        return None
+    session.tokens.append(f"token{len(session.tokens) + 1}")
+    token = {
+        "accessToken": session.tokens[-1],
+        "accessTokenExpirationTimestampMs": int(
+            (time.time() + session.lifetime) * 1000
+        ),
+    }
+    return f'<script id="session">{json.dumps(token)}</script>'
+
+
+def api_data(url):
+    return {"name": url.rsplit("/", 1)[-1], "artists": []}
+
+
+@pytest.fixture
+def session(monkeypatch, token_session):
+    monkeypatch.setattr(spotify, "_tokens", {})
+    return token_session(token_page, api_data, lifetime=3600)
+
+
+def test_token_is_shared_until_it_expires(session):
+    spotify_client = session.client(Spotify)
+    spotify_client.get_tracks_details(["one"])
+    spotify_client.get_albums_details(["two"])
+    # FarOut borrows Spotify's methods, and its token
+    Spotify.get_playlists_details(session.client(FarOut), ["three"])
+    assert len(session.tokens) == 1
+    assert session.sent_headers["authorization"] == "Bearer token1"
+    assert session.headers == {}
+
+
+def test_token_is_refreshed_before_it_expires(session):
+    session.lifetime = Spotify.token_margin / 2
+    spotify_client = session.client(Spotify)
+    spotify_client.get_tracks_details(["one"])
+    spotify_client.get_tracks_details(["two"])
+    assert len(session.tokens) == 2
+
+
+def test_token_is_refreshed_when_refused(session):
+    spotify_client = session.client(Spotify)
+    spotify_client.get_tracks_details(["one"])
+    session.revoked.add("token1")
+
+    assert spotify_client.get_tracks_details(["two"]) == [
+        {"name": "two", "id": "two", "artists": []}
+    ]
+    assert len(session.tokens) == 2
+    assert session.sent_headers["authorization"] == "Bearer token2"
@@ -0,0 +1,77 @@
+import pytest
+from requests.models import Response
+
+from mopidy_tubeify import timing, yt_matcher
+from mopidy_tubeify.serviceclient import ServiceClient
+
+
+class FakeYTMusic:
+    def search(self, query, filter=None, **kwargs):
+        return [
+            {
+                "category": "Songs",
+                "resultType": "song",
+                "videoId": "h5EofwRzit0",
+                "title": "Get Lucky",
+                "artists": [{"name": "Daft Punk", "id": "x"}],
+                "duration_seconds": 369,
+            }
+        ]
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    timing.reset()
+    yt_matcher.yt_matcher_cache.clear()
+    yield
+    timing.reset()
+    yt_matcher.yt_matcher_cache.clear()
+
+
+def test_stages_aggregate():
+    with timing.stage("fetch"):
+        pass
+    with timing.stage("fetch"):
+        pass
+    timing.count("tracks", 3)
+
+    stats = timing.stats()
+    assert stats["stages"]["fetch"]["count"] == 2
+    assert stats["stages"]["fetch"]["seconds"] >= 0
+    assert stats["counters"] == {"tracks": 3}
+
+
+def test_trace_follows_matching_threads():
+    with timing.trace("browse tubeify:test:playlist_1") as trace:
+        yt_matcher.search_and_get_best_match(
+            [
+                {
+                    "song_name": "Get Lucky",
+                    "song_artists": ["Daft Punk"],
+                    "song_duration": 369,
+                    "isrc": None,
+                }
+            ],
+            FakeYTMusic(),
+        )
+
+    assert trace.stages["match"][0] == 1
+    assert trace.stages["ytm"][0] == 1
+    assert trace.stages["score"][0] == 1
+    assert trace.counters == {"tracks": 1, "ytm_songs": 1}
+    assert timing.current() is None
+
+
+def test_items_soup_stages():
+    response = Response()
+    response._content = b"<div class='list'><p>a</p><p>b</p></div>"
+    client = ServiceClient.__new__(ServiceClient)
+    client.service_schema = {
+        "items": {"container": {"class_": "list"}, "item": {"name": "p"}}
+    }
+
+    with timing.trace("page") as trace:
+        items = client._get_items_soup(response, "items")
+
+    assert [item.text for item in items] == ["a", "b"]
+    assert set(trace.stages) == {"parse", "select"}